@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for mys, pdf_text_search.py, dirtree.py and diff.py.
+
+Every input is generated in a temporary directory: a registry served by a local
+HTTP server for mys, a PDF corpus, synthetic directory trees and large line
+files. Results are written as JSON so that a later run can be compared with
+--baseline.
+
+    python benchmarks/bench.py -o before.json
+    python benchmarks/bench.py --baseline before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterator
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_VERSION = 1
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+# Shell completion runs read-only mys commands on every <Tab>
+MYS_STARTUP_TARGET = 0.1
+WORDS = (
+    "alpha beta gamma delta archive invoice database report network kernel cache index "
+    "latency budget vendor ledger payment schema module request throughput".split()
+)
+
+
+@dataclass
+class Scale:
+    registry_entries: int
+    pdf_files: int
+    pdf_pages: int
+    tree_files: int
+    tree_depth: int
+    diff_lines: int
+
+
+SCALES = {
+    "quick": Scale(registry_entries=50, pdf_files=8, pdf_pages=5, tree_files=2_000, tree_depth=200, diff_lines=50_000),
+    "full": Scale(registry_entries=500, pdf_files=40, pdf_pages=20, tree_files=50_000, tree_depth=1_000, diff_lines=2_000_000),
+}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[Path], Callable[[], None]]
+    params: dict[str, object] = field(default_factory=dict)
+    unit: str | None = None
+    units_per_run: int = 0
+    target: float | None = None
+
+
+def run_tool(*args: str | Path) -> None:
+    """Run one of the repo's scripts and fail loudly if it exits non-zero."""
+    subprocess.run(
+        [sys.executable, *map(str, args)],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+# mys sync
+
+
+@contextlib.contextmanager
+def package_server(mys: dict[str, object]) -> Iterator[None]:
+    """Serve generated scripts with ETags over keep-alive HTTP/1.1, like raw.githubusercontent.com."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without this, delayed ACKs dominate the timings
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            body = f"print({self.path!r})\n".encode()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    mys["download_package"].__globals__["build_raw_url"] = (
+        lambda repo, branch, package_path: f"{base_url}/{repo}/{branch}/{package_path}"
+    )
+    try:
+        yield
+    finally:
+        mys["HTTP_POOL"].close()
+        server.shutdown()
+        server.server_close()
+
+
+def setup_mys_sync(entries: int, warm: bool) -> Callable[[Path], Callable[[], None]]:
+    def setup(work_dir: Path) -> Callable[[], None]:
+        mys = runpy.run_path(str(ROOT / "mys"))
+        bin_dir = work_dir / "bin"
+        bin_dir.mkdir()
+        registry_path = work_dir / "registry.tsv"
+        registry_path.write_text(
+            "".join(
+                f"tool{i}\ttool{i}.py\towner/repo\tmain\t{bin_dir / f'tool{i}'}\n" for i in range(entries)
+            ),
+            encoding="utf-8",
+        )
+        args = argparse.Namespace(registry_path=registry_path, jobs=mys["DEFAULT_JOBS"])
+        stack = contextlib.ExitStack()
+        stack.enter_context(package_server(mys))
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        if warm:
+            mys["sync_registry"](args)
+
+        def run() -> None:
+            cache_dir = mys["get_cache_dir"](registry_path)
+            if not warm and cache_dir.exists():
+                for cached in cache_dir.iterdir():
+                    cached.unlink()
+            if mys["sync_registry"](args) != 0:
+                raise RuntimeError("mys sync failed")
+
+        run.close = stack.close  # type: ignore[attr-defined]
+        return run
+
+    return setup
+
+
+def setup_mys_startup(command: tuple[str, ...], entries: int) -> Callable[[Path], Callable[[], None]]:
+    def setup(work_dir: Path) -> Callable[[], None]:
+        registry_path = work_dir / "registry.tsv"
+        registry_path.write_text(
+            "".join(f"tool{i}\ttool{i}.py\towner/repo\tmain\t/usr/local/bin/tool{i}\n" for i in range(entries)),
+            encoding="utf-8",
+        )
+        config_path = work_dir / "config.tsv"
+        return lambda: run_tool(
+            ROOT / "mys", "--config-path", config_path, "--registry-path", registry_path, *command
+        )
+
+    return setup
+
+
+# pdf_text_search.py
+
+
+def make_pdf(path: Path, pages: list[str]) -> None:
+    """Write a minimal uncompressed PDF with one text line per sentence."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages):
+        lines = " ".join(f"({line}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 10 Tf 20 750 Td 12 TL {lines} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode())
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+
+
+def make_pdf_corpus(corpus_dir: Path, files: int, pages: int, rng: random.Random) -> None:
+    corpus_dir.mkdir()
+    for file_index in range(files):
+        make_pdf(
+            corpus_dir / f"doc{file_index:04d}.pdf",
+            [
+                "\n".join(
+                    " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+                    for _ in range(40)
+                )
+                for _ in range(pages)
+            ],
+        )
+
+
+def setup_pdf_search(scale: Scale, cached: bool, jobs: int) -> Callable[[Path], Callable[[], None]]:
+    def setup(work_dir: Path) -> Callable[[], None]:
+        corpus_dir = work_dir / "corpus"
+        make_pdf_corpus(corpus_dir, scale.pdf_files, scale.pdf_pages, random.Random(18))
+        cache_path = work_dir / "extractions.sqlite3"
+        command = [ROOT / "pdf_text_search.py", "invoice", corpus_dir, "-j", str(jobs), "--json"]
+        if cached:
+            command += ["--cache-path", cache_path]
+            run_tool(*command)
+        else:
+            command.append("--no-cache")
+        return lambda: run_tool(*command)
+
+    return setup
+
+
+# dirtree.py
+
+
+def make_tree(root: Path, shape: str, files: int, depth: int) -> None:
+    """Create an empty-file tree: one wide directory, a deep chain, or a balanced fan-out."""
+    root.mkdir()
+    if shape == "wide":
+        for i in range(files):
+            (root / f"file{i:06d}.txt").write_bytes(b"x" * (i % 4096))
+    elif shape == "deep":
+        # Built with relative paths so that the absolute path never gets too long for the OS
+        cwd = os.getcwd()
+        try:
+            os.chdir(root)
+            for level in range(depth):
+                Path(f"file{level}.txt").write_bytes(b"x" * level)
+                os.mkdir("d")
+                os.chdir("d")
+        finally:
+            os.chdir(cwd)
+    else:
+        fan_out = 8
+        directories = [root]
+        while len(directories) * fan_out < files // fan_out:
+            directories = [parent / f"dir{i}" for parent in directories for i in range(fan_out)]
+            for directory in directories:
+                directory.mkdir()
+        for i in range(files):
+            (directories[i % len(directories)] / f"file{i:06d}.txt").write_bytes(b"x" * (i % 4096))
+
+
+def setup_dirtree(shape: str, scale: Scale, extra_args: tuple[str, ...]) -> Callable[[Path], Callable[[], None]]:
+    def setup(work_dir: Path) -> Callable[[], None]:
+        tree = work_dir / "tree"
+        make_tree(tree, shape, scale.tree_files, scale.tree_depth)
+        return lambda: run_tool(ROOT / "dirtree.py", tree, *extra_args)
+
+    return setup
+
+
+# diff.py
+
+
+def make_package_lists(work_dir: Path, lines: int, rng: random.Random) -> tuple[Path, Path]:
+    """Write two shuffled package lists that share about 90% of their lines."""
+    old = [f"package{rng.randrange(lines * 10):08d}==1.{rng.randrange(20)}.{rng.randrange(10)}" for _ in range(lines)]
+    new = old[: lines * 9 // 10] + [f"package{rng.randrange(lines * 10):08d}==2.0.0" for _ in range(lines // 10)]
+    rng.shuffle(new)
+    paths = (work_dir / "old.txt", work_dir / "new.txt")
+    for path, content in zip(paths, (old, new)):
+        path.write_text("\n".join(content) + "\n", encoding="utf-8")
+    return paths
+
+
+def setup_diff(scale: Scale, mode: str) -> Callable[[Path], Callable[[], None]]:
+    def setup(work_dir: Path) -> Callable[[], None]:
+        old, new = make_package_lists(work_dir, scale.diff_lines, random.Random(17))
+        extra_args: list[str] = []
+        if mode == "sorted":
+            for path in (old, new):
+                path.write_text("".join(sorted(path.read_text(encoding="utf-8").splitlines(True))), encoding="utf-8")
+            extra_args = ["--sorted"]
+        elif mode == "stream":
+            # A small buffer so that the external sort actually spills to disk
+            extra_args = ["--stream", "--buffer-size", "8"]
+        output = work_dir / "diff.txt"
+        return lambda: run_tool(ROOT / "diff.py", old, new, "--symmetric", "-o", output, *extra_args)
+
+    return setup
+
+
+def build_benchmarks(scale: Scale) -> list[Benchmark]:
+    benchmarks = [
+        Benchmark(
+            f"mys.sync.{state}",
+            setup_mys_sync(scale.registry_entries, warm=state == "warm"),
+            {"entries": scale.registry_entries},
+            "packages",
+            scale.registry_entries,
+        )
+        for state in ("cold", "warm")
+    ]
+    benchmarks += [
+        Benchmark(
+            f"mys.startup.{command[0]}",
+            setup_mys_startup(command, scale.registry_entries),
+            {"entries": scale.registry_entries},
+            target=MYS_STARTUP_TARGET,
+        )
+        for command in (("list",), ("url", "linux/dirtree.py"))
+    ]
+    if importlib.util.find_spec("PyPDF2") and importlib.util.find_spec("colorama"):
+        pages = scale.pdf_files * scale.pdf_pages
+        benchmarks += [
+            Benchmark(
+                f"pdf.search.{'cached' if cached else 'uncached'}.j{jobs}",
+                setup_pdf_search(scale, cached, jobs),
+                {"files": scale.pdf_files, "pages_per_file": scale.pdf_pages, "jobs": jobs},
+                "pages",
+                pages,
+            )
+            for cached, jobs in ((False, 1), (False, 4), (True, 1))
+        ]
+    for shape in ("wide", "deep", "balanced"):
+        entries = scale.tree_depth * 2 if shape == "deep" else scale.tree_files
+        for mode, extra_args in (("tree", ()), ("sizes", ("--sizes",))):
+            benchmarks.append(
+                Benchmark(
+                    f"dirtree.{mode}.{shape}",
+                    setup_dirtree(shape, scale, extra_args),
+                    {"shape": shape, "files": scale.tree_files, "depth": scale.tree_depth},
+                    "entries",
+                    entries,
+                )
+            )
+    benchmarks += [
+        Benchmark(
+            f"diff.{mode}",
+            setup_diff(scale, mode),
+            {"lines": scale.diff_lines},
+            "lines",
+            scale.diff_lines * 2,
+        )
+        for mode in ("sets", "sorted", "stream")
+    ]
+    return benchmarks
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int) -> dict[str, object]:
+    """Set up a benchmark in a fresh temporary directory, then time `repeat` runs of it."""
+    with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+        run = benchmark.setup(Path(work_dir))
+        try:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+        finally:
+            getattr(run, "close", lambda: None)()
+
+    result: dict[str, object] = {
+        "params": benchmark.params,
+        "runs": [round(timing, 6) for timing in timings],
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6),
+    }
+    if benchmark.target is not None:
+        result["target"] = benchmark.target
+        result["within_target"] = min(timings) <= benchmark.target
+    if benchmark.unit:
+        result["throughput"] = round(benchmark.units_per_run / min(timings), 1)
+        result["unit"] = f"{benchmark.unit}/s"
+    return result
+
+
+def compare_with_baseline(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Print each benchmark's change against the baseline and return the names that got slower."""
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<32} {'-':>10} {result['min']:>9.3f}s {'new':>8}")
+            continue
+        if baseline[name].get("params") != result["params"]:
+            print(f"{name:<32} {'(different parameters, not compared)':>30}")
+            continue
+        before, after = baseline[name]["min"], result["min"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32} {before:>9.3f}s {after:>9.3f}s {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick", help="Input sizes (default: quick).")
+    parser.add_argument("-n", "--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark; the fastest is kept.")
+    parser.add_argument("-k", "--only", action="append", default=[], metavar="PREFIX", help="Only run benchmarks whose name starts with PREFIX (repeatable).")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, help="Compare against the JSON results of an earlier run.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Slowdown over the baseline reported as a regression (default: {DEFAULT_TOLERANCE:.0%}%).",
+    )
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    scale = SCALES[args.scale]
+    benchmarks = [
+        benchmark
+        for benchmark in build_benchmarks(scale)
+        if not args.only or any(benchmark.name.startswith(prefix) for prefix in args.only)
+    ]
+    results: dict[str, dict] = {}
+    for benchmark in benchmarks:
+        print(f"{benchmark.name} ...", end=" ", file=sys.stderr, flush=True)
+        results[benchmark.name] = run_benchmark(benchmark, args.repeat)
+        summary = f"{results[benchmark.name]['min']:.3f}s"
+        if "throughput" in results[benchmark.name]:
+            summary += f" ({results[benchmark.name]['throughput']:,} {results[benchmark.name]['unit']})"
+        if "target" in results[benchmark.name]:
+            within = results[benchmark.name]["within_target"]
+            summary += f" ({'within' if within else 'OVER'} target of {benchmark.target:.3f}s)"
+        print(summary, file=sys.stderr)
+
+    report = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scale": args.scale,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    over_target = [name for name, result in results.items() if result.get("within_target") is False]
+    if over_target:
+        print(f"\n{len(over_target)} benchmark(s) over their target time: {', '.join(over_target)}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("scale") != args.scale:
+            print(f"bench: baseline was run with --scale {baseline.get('scale')}", file=sys.stderr)
+        regressions = compare_with_baseline(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline: {', '.join(regressions)}")
+            return 1
+    return 1 if over_target else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -33,16 +33,19 @@ _mys() {
         registry="$(_mys_registry_path)"
         registry="${registry/#\~/$HOME}"
         [[ -f "$registry" ]] || return
-        awk -F'\t' 'NF==5 { print $1 }' "$registry" 2>/dev/null
+        awk -F'\t' 'NF>=5 { print $1 }' "$registry" 2>/dev/null
     }
 
     # ── constants ─────────────────────────────────────────────────────────────
 
-    local -r COMMANDS='install update remove list export import sync url config self-update'
-    local -r GLOBAL_FLAGS='--repo --branch --bin-dir --registry-path --config-path'
-    local -r FLAGS_INSTALL='--as --keep-extension'
-    local -r FLAGS_UPDATE='--as --keep-extension'
+    local -r COMMANDS='install update remove list export import sync url bundle config self-update'
+    local -r GLOBAL_FLAGS='--repo --branch --bin-dir --registry-path --config-path --max-size --profile --trace'
+    local -r FLAGS_INSTALL='--as --keep-extension --manifest --jobs'
+    local -r FLAGS_UPDATE='--as --keep-extension --manifest --jobs'
     local -r FLAGS_IMPORT='--replace'
+    local -r FLAGS_SYNC='--jobs'
+    local -r FLAGS_LIST='--check'
+    local -r FLAGS_BUNDLE='--manifest --registry --jobs'
     local -r FLAGS_CONFIG='--repo --branch --bin-dir --registry-path'
 
     # ── detect current command ────────────────────────────────────────────────
@@ -51,10 +54,10 @@ _mys() {
     local i
     for (( i = 1; i < cword; i++ )); do
         case "${words[i]}" in
-            --repo|--branch|--bin-dir|--registry-path|--config-path|--as)
+            --repo|--branch|--bin-dir|--registry-path|--config-path|--max-size|--trace|--as|--jobs|-j|--manifest|-f)
                 (( i++ ))
                 ;;
-            --keep-extension|--replace)
+            --keep-extension|--replace|--check|--profile)
                 ;;
             -*)
                 ;;
@@ -86,6 +89,9 @@ _mys() {
             install)   COMPREPLY=( $(compgen -W "$FLAGS_INSTALL $GLOBAL_FLAGS" -- "$cur") ) ;;
             update)    COMPREPLY=( $(compgen -W "$FLAGS_UPDATE  $GLOBAL_FLAGS" -- "$cur") ) ;;
             import)    COMPREPLY=( $(compgen -W "$FLAGS_IMPORT  $GLOBAL_FLAGS" -- "$cur") ) ;;
+            list)      COMPREPLY=( $(compgen -W "$FLAGS_LIST    $GLOBAL_FLAGS" -- "$cur") ) ;;
+            sync)      COMPREPLY=( $(compgen -W "$FLAGS_SYNC    $GLOBAL_FLAGS" -- "$cur") ) ;;
+            bundle)    COMPREPLY=( $(compgen -W "$FLAGS_BUNDLE  $GLOBAL_FLAGS" -- "$cur") ) ;;
             config)    COMPREPLY=( $(compgen -W "$FLAGS_CONFIG  $GLOBAL_FLAGS" -- "$cur") ) ;;
             *)         COMPREPLY=( $(compgen -W "$GLOBAL_FLAGS" -- "$cur") ) ;;
         esac
@@ -99,11 +105,12 @@ _mys() {
             _filedir -d
             return
             ;;
-        --registry-path|--config-path)
+        --registry-path|--config-path|--manifest|-f|--repo)
+            # --repo also takes a local checkout or bundle
             _filedir
             return
             ;;
-        --repo|--branch|--as)
+        --branch|--as|--jobs|-j|--max-size)
             return
             ;;
     esac
@@ -137,7 +144,7 @@ _mys() {
             return
             ;;
 
-        export)
+        export|bundle)
             _filedir
             return
             ;;
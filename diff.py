@@ -1,5 +1,191 @@
 import argparse
+import heapq
+import os
+import re
 import sys
+import tempfile
+from collections import namedtuple
+from contextlib import ExitStack
+
+DEFAULT_BUFFER_MB = 256
+# Rough per-line cost of a str in a list on top of its characters
+LINE_OVERHEAD_BYTES = 80
+# Most spill files merged at once, to stay well below the open-file limit
+MERGE_FAN_IN = 64
+
+# name[extras] specifier-or-url ; markers
+REQUIREMENT_LINE = re.compile(r"^([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*(?:\[([^\]]*)\])?\s*(.*)$")
+INCLUDE_OPTION = re.compile(r"^(-r|--requirement|-c|--constraint)(?:\s*=\s*|\s+|(?<=^-[rc]))(\S.*)$")
+EDITABLE_OPTION = re.compile(r"^(?:-e|--editable)(?:\s*=\s*|\s+)(\S.*)$")
+EGG_FRAGMENT = re.compile(r"#egg=([A-Za-z0-9._-]+)")
+# Per-requirement pip options such as --hash=sha256:...; they do not change what is required
+REQUIREMENT_OPTION = re.compile(
+    r"\s+(?:--hash|--config-settings|--global-option|--install-option|-C)(?:\s*=\s*|\s+)\S+"
+)
+# One token of an environment marker: a quoted string, an operator, a parenthesis or a word
+MARKER_TOKEN = re.compile(r"""\s*("[^"]*"|'[^']*'|===|[=!<>~]=|[<>()]|[^\s()"'<>=!~]+)""")
+
+Requirement = namedtuple("Requirement", ["name", "extras", "specifier", "marker"])
+
+def normalize_name(name):
+    """Normalize a project name as in PEP 503: lowercase, runs of -_. become a single -."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def format_requirement(req):
+    if req.specifier.startswith("-e "):
+        return req.specifier
+    extras = f"[{','.join(req.extras)}]" if req.extras else ""
+    specifier = f" {req.specifier}" if req.specifier.startswith("@") else req.specifier
+    marker = f"; {req.marker}" if req.marker else ""
+    return f"{req.name}{extras}{specifier}{marker}"
+
+def normalize_marker(marker):
+    """
+    Normalize an environment marker to single spaces between tokens, none inside
+    parentheses, and double-quoted strings, so that python_version>='3.8' and
+    python_version >= "3.8" compare equal. A marker that cannot be tokenized
+    only has its whitespace collapsed.
+    """
+    marker = marker.strip()
+    tokens = []
+    position = 0
+    while position < len(marker):
+        match = MARKER_TOKEN.match(marker, position)
+        if not match:
+            return " ".join(marker.split())
+        token = match.group(1)
+        if token.startswith("'") and '"' not in token:
+            token = f'"{token[1:-1]}"'
+        tokens.append(token)
+        position = match.end()
+
+    normalized = ""
+    for token in tokens:
+        if normalized and not normalized.endswith("(") and token != ")":
+            normalized += " "
+        normalized += token
+    return normalized
+
+def parse_requirement(text):
+    """
+    Split a requirement such as 'Django[argon2] >= 4.2, <5 ; python_version >= "3.10"'
+    into a Requirement with a normalized name, sorted extras, a specifier without
+    whitespace (clauses sorted) or '@ url', and a marker normalized by
+    normalize_marker. Per-requirement options (--hash, --config-settings, ...)
+    are dropped. Returns None if text is not a requirement.
+    """
+    requirement, _, marker = REQUIREMENT_OPTION.sub("", " " + text).partition(";")
+    match = REQUIREMENT_LINE.match(requirement.strip())
+    if not match:
+        return None
+    name, extras, rest = match.groups()
+    rest = rest.strip()
+    if rest.startswith("@"):
+        specifier = "@ " + rest[1:].strip()
+    else:
+        specifier = ",".join(sorted(clause for clause in re.sub(r"\s+", "", rest).strip("()").split(",") if clause))
+    extras = tuple(sorted({normalize_name(extra.strip()) for extra in (extras or "").split(",") if extra.strip()}))
+    return Requirement(normalize_name(name), extras, specifier, normalize_marker(marker))
+
+def iter_logical_lines(lines):
+    """
+    Yield (line_number, line) for requirement lines without comments, joining
+    lines that end with a backslash; line_number is that of the first one.
+    """
+    pending = ""
+    start = None
+    for line_number, line in enumerate(lines, 1):
+        # As in pip, a comment starts at a '#' at the start of the line or after whitespace
+        line = re.sub(r"(^|\s)#.*$", "", line.rstrip("\n"))
+        start = start or line_number
+        if line.endswith("\\"):
+            pending += line[:-1]
+            continue
+        line = (pending + line).strip()
+        if line:
+            yield start, line
+        pending = ""
+        start = None
+    if pending.strip():
+        yield start, pending.strip()
+
+def parse_requirement_lines(lines, base_dir, cache, including=(), source="stdin"):
+    """
+    Return ({(name, marker): Requirement}, complete) for requirement lines, following
+    -r includes. Included paths are relative to base_dir. Each file is parsed
+    once per cache, however many files include it. complete is False if an
+    include cycle was skipped. Constraint files (-c) only pin versions and do
+    not add requirements, so they are skipped, as are other pip options.
+    Raises ValueError naming source and the line of an include that cannot be read.
+    """
+    requirements = {}
+    complete = True
+    for line_number, line in iter_logical_lines(lines):
+        include = INCLUDE_OPTION.match(line)
+        if include:
+            if include.group(1) in ("-r", "--requirement"):
+                included_path = os.path.join(base_dir, include.group(2).strip())
+                try:
+                    included, included_complete = parse_requirements_file(included_path, cache, including)
+                except OSError as e:
+                    raise ValueError(f"{source}:{line_number}: cannot read {included_path}: {e.strerror}") from e
+                requirements.update(included)
+                complete = complete and included_complete
+            continue
+        editable = EDITABLE_OPTION.match(line)
+        if editable:
+            egg = EGG_FRAGMENT.search(editable.group(1))
+            name = normalize_name(egg.group(1)) if egg else editable.group(1)
+            req = Requirement(name, (), f"-e {editable.group(1)}", "")
+        elif line.startswith("-"):
+            continue
+        else:
+            req = parse_requirement(line)
+            if req is None:
+                print(f"Warning: cannot parse requirement {line!r}, comparing it as is.", file=sys.stderr)
+                req = Requirement(line, (), "", "")
+        requirements[(req.name, req.marker)] = req
+    return requirements, complete
+
+def parse_requirements_file(file_path, cache=None, including=()):
+    """
+    Parse a requirements file with parse_requirement_lines, caching the result by
+    real path. A parse that skipped an include cycle depends on where the cycle
+    was entered, so it is not cached.
+    """
+    cache = {} if cache is None else cache
+    real_path = os.path.realpath(file_path)
+    if real_path in including:
+        print(f"Warning: {file_path} includes itself, skipping.", file=sys.stderr)
+        return {}, False
+    if real_path in cache:
+        return cache[real_path], True
+
+    with open(file_path, 'r') as f:
+        requirements, complete = parse_requirement_lines(f, os.path.dirname(file_path), cache,
+                                                         including + (real_path,), file_path)
+    if complete:
+        cache[real_path] = requirements
+    return requirements, complete
+
+def compare_requirements(reqs1, reqs2):
+    """Return sorted lists of added and removed Requirements and of (old, new) pairs that changed."""
+    added = [reqs2[key] for key in sorted(reqs2.keys() - reqs1.keys())]
+    removed = [reqs1[key] for key in sorted(reqs1.keys() - reqs2.keys())]
+    changed = [(reqs1[key], reqs2[key]) for key in sorted(reqs1.keys() & reqs2.keys()) if reqs1[key] != reqs2[key]]
+    return added, removed, changed
+
+def format_requirement_changes(added, removed, changed, symmetric):
+    """
+    Return output lines: '+ req' for added, '- req' for removed (only when
+    symmetric) and '~ old -> new' for requirements whose version, extras or
+    source changed.
+    """
+    lines = [f"+ {format_requirement(req)}" for req in added]
+    if symmetric:
+        lines += [f"- {format_requirement(req)}" for req in removed]
+    lines += [f"~ {format_requirement(old)} -> {format_requirement(new)}" for old, new in changed]
+    return lines
 
 def read_requirements(file_path):
     with open(file_path, 'r') as f:
@@ -10,6 +196,124 @@ def read_from_stdin():
     # Read lines from stdin, ignore empty lines and comments
     return set(line.strip() for line in sys.stdin if line.strip() and not line.strip().startswith('#'))
 
+def iter_entries(lines):
+    """Yield stripped lines, skipping empty lines and comments, without reading ahead."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+def iter_unique_sorted(entries, source):
+    """Yield entries with duplicates dropped, checking that they arrive in sorted order."""
+    previous = None
+    for entry in entries:
+        if previous is not None and entry <= previous:
+            if entry == previous:
+                continue
+            raise ValueError(f"{source} is not sorted: {entry!r} comes after {previous!r}")
+        previous = entry
+        yield entry
+
+def iter_spilled_lines(path):
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+        for line in f:
+            yield line[:-1]
+
+def external_sort(entries, buffer_bytes, temp_dir=None):
+    """
+    Yield entries in sorted order using at most about buffer_bytes of memory.
+    Entries are sorted in chunks that fit the buffer. If everything fits in
+    one chunk it is sorted in memory; otherwise each chunk is spilled to a
+    temporary file and the files are merged with heapq.merge, which only
+    keeps one line per file in memory, in passes of at most MERGE_FAN_IN files.
+    """
+    with tempfile.TemporaryDirectory(prefix="diff-", dir=temp_dir) as spill_dir:
+        chunk = []
+        chunk_bytes = 0
+        spill_paths = []
+        for entry in entries:
+            chunk.append(entry)
+            chunk_bytes += len(entry) + LINE_OVERHEAD_BYTES
+            if chunk_bytes >= buffer_bytes:
+                spill_paths.append(spill_chunk(chunk, spill_dir, len(spill_paths)))
+                chunk = []
+                chunk_bytes = 0
+
+        if not spill_paths:
+            chunk.sort()
+            yield from chunk
+            return
+        if chunk:
+            spill_paths.append(spill_chunk(chunk, spill_dir, len(spill_paths)))
+            chunk = []
+        spill_count = len(spill_paths)
+        while len(spill_paths) > MERGE_FAN_IN:
+            # Merge in passes so that no more than MERGE_FAN_IN files are open at once
+            merged_paths = []
+            for start in range(0, len(spill_paths), MERGE_FAN_IN):
+                group = spill_paths[start:start + MERGE_FAN_IN]
+                path = os.path.join(spill_dir, f"chunk-{spill_count}.txt")
+                spill_count += 1
+                merged_entries = heapq.merge(*(iter_spilled_lines(spilled) for spilled in group))
+                with open(path, 'w', encoding='utf-8', errors='surrogateescape') as f:
+                    f.writelines(entry + '\n' for entry in merged_entries)
+                for merged in group:
+                    os.unlink(merged)
+                merged_paths.append(path)
+            spill_paths = merged_paths
+        yield from heapq.merge(*(iter_spilled_lines(path) for path in spill_paths))
+
+def spill_chunk(chunk, spill_dir, index):
+    chunk.sort()
+    path = os.path.join(spill_dir, f"chunk-{index}.txt")
+    with open(path, 'w', encoding='utf-8', errors='surrogateescape') as f:
+        f.writelines(entry + '\n' for entry in chunk)
+    return path
+
+def merge_diff(entries1, entries2, symmetric):
+    """
+    Yield the difference of two sorted, duplicate-free iterables in sorted order:
+    entries only in entries2, or with symmetric, entries in either but not both.
+    Only the current entry of each side is held in memory.
+    """
+    missing = object()
+    it1, it2 = iter(entries1), iter(entries2)
+    a, b = next(it1, missing), next(it2, missing)
+    while a is not missing and b is not missing:
+        if a == b:
+            a, b = next(it1, missing), next(it2, missing)
+        elif a < b:
+            if symmetric:
+                yield a
+            a = next(it1, missing)
+        else:
+            yield b
+            b = next(it2, missing)
+    if symmetric:
+        while a is not missing:
+            yield a
+            a = next(it1, missing)
+    while b is not missing:
+        yield b
+        b = next(it2, missing)
+
+def stream_diff(file1, file2, symmetric, presorted, buffer_bytes):
+    """
+    Yield the line difference of file1 and file2 (or stdin) with bounded memory.
+    With presorted, inputs are only checked to be sorted; otherwise each is
+    sorted externally, splitting the buffer between the two.
+    """
+    with ExitStack() as stack:
+        inputs = [(stack.enter_context(open(file1, 'r')), file1)]
+        inputs.append((stack.enter_context(open(file2, 'r')), file2) if file2 else (sys.stdin, "stdin"))
+        sides = []
+        for f, source in inputs:
+            entries = iter_entries(f)
+            if not presorted:
+                entries = external_sort(entries, buffer_bytes // 2)
+            sides.append(iter_unique_sorted(entries, source))
+        yield from merge_diff(*sides, symmetric)
+
 def main():
     parser = argparse.ArgumentParser(
         description="Find the difference between two requirements.txt files or between a file and stdin. "
@@ -22,33 +326,75 @@ def main():
     parser.add_argument("-o", "--output", help="Output file to write the difference", required=False)
     parser.add_argument("-s", "--symmetric", action="store_true", help="Compute symmetric difference (packages in either file but not both)")
     parser.add_argument("-a", "--append", action="store_true", help="Append to the output file instead of overwriting (requires -o)")
+    parser.add_argument("-p", "--parse", action="store_true",
+                        help="Parse requirements: normalize names, follow -r includes, and report added (+), "
+                             "removed (-, with --symmetric) and changed (~) packages")
+    parser.add_argument("--sorted", action="store_true",
+                        help="Inputs are already sorted (e.g. with 'LC_ALL=C sort'): compare them in one streaming "
+                             "pass with constant memory")
+    parser.add_argument("--stream", action="store_true",
+                        help="Compare inputs of any size with bounded memory, sorting them externally with "
+                             "temporary files as needed")
+    parser.add_argument("--buffer-size", type=int, default=DEFAULT_BUFFER_MB, metavar="MB",
+                        help=f"Memory to use for sorting with --stream before spilling to disk "
+                             f"(default: {DEFAULT_BUFFER_MB})")
     args = parser.parse_args()
+    streaming = args.sorted or args.stream
+    if streaming and args.parse:
+        parser.error("--parse cannot be combined with --sorted or --stream")
+    if args.buffer_size < 1:
+        parser.error("--buffer-size must be at least 1")
 
-    reqs1 = read_requirements(args.file1)
-    if args.file2:
-        reqs2 = read_requirements(args.file2)
+    if streaming:
+        # Lines are produced lazily and written as they are found
+        diff = stream_diff(args.file1, args.file2, args.symmetric, args.sorted, args.buffer_size * 1024 * 1024)
+    elif args.parse:
+        cache = {}
+        try:
+            reqs1, _ = parse_requirements_file(args.file1, cache)
+            if args.file2:
+                reqs2, _ = parse_requirements_file(args.file2, cache)
+            else:
+                reqs2, _ = parse_requirement_lines(sys.stdin, os.getcwd(), cache)
+        except OSError as e:
+            print(f"Error: cannot read {e.filename}: {e.strerror}", file=sys.stderr)
+            sys.exit(1)
+        except ValueError as e:
+            # An -r include that cannot be read
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        diff = format_requirement_changes(*compare_requirements(reqs1, reqs2), args.symmetric)
     else:
-        reqs2 = read_from_stdin()
+        reqs1 = read_requirements(args.file1)
+        if args.file2:
+            reqs2 = read_requirements(args.file2)
+        else:
+            reqs2 = read_from_stdin()
 
-    # Compute difference based on symmetric flag
-    if args.symmetric:
-        diff = sorted(reqs1.symmetric_difference(reqs2))
-    else:
-        diff = sorted(reqs2 - reqs1)
+        # Compute difference based on symmetric flag
+        if args.symmetric:
+            diff = sorted(reqs1.symmetric_difference(reqs2))
+        else:
+            diff = sorted(reqs2 - reqs1)
 
-    if args.output:
-        # Use 'a' mode for append if --append is set, otherwise 'w' for overwrite
-        mode = 'a' if args.append else 'w'
-        with open(args.output, mode) as out:
+    try:
+        if args.output:
+            # Use 'a' mode for append if --append is set, otherwise 'w' for overwrite
+            mode = 'a' if args.append else 'w'
+            with open(args.output, mode) as out:
+                for pkg in diff:
+                    out.write(pkg + '\n')
+            action = "appended to" if args.append else "written to"
+            print(f"{'Symmetric difference' if args.symmetric else 'Difference'} {action} {args.output}")
+        else:
+            if args.append:
+                print("Warning: --append ignored because no output file (-o) was specified.")
             for pkg in diff:
-                out.write(pkg + '\n')
-        action = "appended to" if args.append else "written to"
-        print(f"{'Symmetric difference' if args.symmetric else 'Difference'} {action} {args.output}")
-    else:
-        if args.append:
-            print("Warning: --append ignored because no output file (-o) was specified.")
-        for pkg in diff:
-            print(pkg)
+                print(pkg)
+    except ValueError as e:
+        # Raised while streaming when an input given with --sorted is not sorted
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,27 +1,452 @@
 import os
+import re
+import sys
+import gzip
+import json
+import queue
 import argparse
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor
 
-def print_tree(start_path, prefix="", show_hidden=True):
-    entries = sorted(os.listdir(start_path))
-    if not show_hidden:
-        entries = [e for e in entries if not e.startswith('.')]
-    entries_count = len(entries)
-    for idx, entry in enumerate(entries):
-        path = os.path.join(start_path, entry)
-        connector = "└── " if idx == entries_count - 1 else "├── "
-        print(prefix + connector + entry)
-        if os.path.isdir(path):
-            extension = "    " if idx == entries_count - 1 else "│   "
-            print_tree(path, prefix + extension, show_hidden=show_hidden)
+OUTPUT_CHUNK_LINES = 4096
+DEFAULT_SIZE_JOBS = 8
+SIZE_UNITS = ["B", "K", "M", "G", "T", "P"]
+SNAPSHOT_VERSION = 1
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)(?:I?B)?\s*$", re.IGNORECASE)
+
+def is_excluded(name, rel_path, exclude):
+    """Return True if an entry's name or path relative to the root matches an exclude glob."""
+    return any(fnmatch(name, pattern) or fnmatch(rel_path, pattern) for pattern in exclude)
+
+def scan_entries(path, rel_path, show_hidden, exclude):
+    """Return the sorted, filtered DirEntry objects of a directory, or None if it cannot be read."""
+    try:
+        with os.scandir(path) as it:
+            entries = [
+                entry for entry in it
+                if (show_hidden or not entry.name.startswith('.'))
+                and not (exclude and is_excluded(entry.name, os.path.join(rel_path, entry.name), exclude))
+            ]
+    except OSError as e:
+        print(f"dirtree: cannot read {path}: {e.strerror}", file=sys.stderr)
+        return None
+    entries.sort(key=lambda entry: entry.name)
+    return entries
+
+def directory_id(path_or_entry):
+    """Return (device, inode) of a directory, following symlinks, or None if it cannot be stat'ed."""
+    try:
+        st = path_or_entry.stat() if isinstance(path_or_entry, os.DirEntry) else os.stat(path_or_entry)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+def render_tree(items, expand, max_depth=None):
+    """
+    Yield tree lines for items, a list of (label, node) pairs.
+    expand(node) returns the (label, node) pairs below a node, or nothing for
+    leaves (node None). Rendering keeps its own stack of open levels instead of
+    recursing, so deep trees cannot hit the recursion limit, and each level's
+    prefix is built once rather than once per line.
+    """
+    stack = [(items, 0, "", 1)]
+    while stack:
+        items, idx, prefix, depth = stack[-1]
+        if idx == len(items):
+            stack.pop()
+            continue
+        stack[-1] = (items, idx + 1, prefix, depth)
+
+        label, node = items[idx]
+        is_last = idx == len(items) - 1
+        yield prefix + ("└── " if is_last else "├── ") + label
+        if node is None or (max_depth is not None and depth >= max_depth):
+            continue
+        children = expand(node)
+        if children:
+            stack.append((children, 0, prefix + ("    " if is_last else "│   "), depth + 1))
+
+def iter_tree(start_path, show_hidden=True, max_depth=None, exclude=()):
+    """
+    Yield the lines of the tree below start_path, without the root line.
+    Directories are listed with os.scandir only when the walk reaches them,
+    and types come from the DirEntry cache, so plain files cost no extra stat
+    call. Directory symlinks are followed unless they point back to a
+    directory already on the current path. Each directory links to its parent
+    instead of carrying a copy of the whole path, so memory stays linear in the
+    depth; the path is only walked for symlinks.
+    """
+    def on_path(dir_id, node):
+        while node is not None:
+            if node[2] == dir_id:
+                return True
+            node = node[3]
+        return False
+
+    def expand(node):
+        path, rel_path = node[0], node[1]
+        entries = scan_entries(path, rel_path, show_hidden, exclude) or []
+        items = []
+        for entry in entries:
+            if not entry.is_dir():
+                items.append((entry.name, None))
+                continue
+            dir_id = directory_id(entry)
+            if entry.is_symlink() and on_path(dir_id, node):
+                items.append((entry.name + "  [recursive, not followed]", None))
+            else:
+                items.append((entry.name, (entry.path, os.path.join(rel_path, entry.name), dir_id, node)))
+        return items
+
+    yield from render_tree(expand((start_path, "", directory_id(start_path), None)), expand, max_depth)
+
+class DiskUsage:
+    """Apparent size and file count of a file, or of a directory including everything below it."""
+    __slots__ = ("name", "size", "files", "children", "mtime")
+
+    def __init__(self, name, size=0, files=0, children=None, mtime=None):
+        self.name = name
+        self.size = size
+        self.files = files
+        self.children = children  # None for anything that is not a directory
+        self.mtime = mtime  # st_mtime_ns of a directory when it was listed
+
+def parse_size(text):
+    """Parse a size such as 4096, 512K, 100M or 1.5GiB into bytes (binary units)."""
+    match = SIZE_PATTERN.match(text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** SIZE_UNITS.index(unit.upper() or "B"))
+
+def format_size(size):
+    """Format a byte count like `du -h`: 512B, 1.5K, 23M."""
+    value = float(size)
+    for unit in SIZE_UNITS:
+        if value < 1024 or unit == SIZE_UNITS[-1]:
+            break
+        value /= 1024
+    if unit == "B":
+        return f"{size}B"
+    return f"{value:.1f}{unit}" if value < 10 else f"{value:.0f}{unit}"
+
+def scan_usage(start_path, show_hidden=True, exclude=(), jobs=DEFAULT_SIZE_JOBS, previous=None, rescanned=None):
+    """
+    Return the DiskUsage tree of start_path with cumulative sizes and file counts.
+    Every directory is its own task on a thread pool, since scandir and stat
+    release the GIL, which keeps network and NVMe volumes busy. Like du,
+    symlinks are counted as themselves and never followed.
+    With a previous tree, a directory whose mtime is unchanged is not listed
+    again: its files are taken from the previous scan and only its
+    subdirectories are checked. Paths of the directories that were listed
+    are appended to rescanned.
+    """
+    root = DiskUsage(start_path, children=[])
+
+    def scan(node, path, rel_path, old_node):
+        subdirs = []
+        try:
+            node.mtime = os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            node.mtime = None
+        if old_node is not None and node.mtime is not None and old_node.mtime == node.mtime:
+            for old_child in old_node.children:
+                if old_child.children is None:
+                    node.children.append(DiskUsage(old_child.name, old_child.size, 1))
+                    continue
+                child = DiskUsage(old_child.name, children=[])
+                subdirs.append((child, os.path.join(path, child.name), os.path.join(rel_path, child.name), old_child))
+                node.children.append(child)
+            return subdirs
+
+        if rescanned is not None:
+            rescanned.append(rel_path or ".")
+        old_subdirs = {
+            old_child.name: old_child for old_child in old_node.children if old_child.children is not None
+        } if old_node is not None else {}
+        for entry in scan_entries(path, rel_path, show_hidden, exclude) or []:
+            if entry.is_dir(follow_symlinks=False):
+                child = DiskUsage(entry.name, children=[])
+                subdirs.append((child, entry.path, os.path.join(rel_path, entry.name), old_subdirs.get(entry.name)))
+            else:
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    size = 0
+                child = DiskUsage(entry.name, size, 1)
+            node.children.append(child)
+        return subdirs
+
+    # Finished scans are handed back through a queue, so each one is picked up in
+    # constant time however many directories are still waiting
+    finished = queue.SimpleQueue()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        def submit(*subdir):
+            executor.submit(scan, *subdir).add_done_callback(finished.put)
+
+        submit(root, start_path, "", previous)
+        outstanding = 1
+        while outstanding:
+            subdirs = finished.get().result()
+            outstanding += len(subdirs) - 1
+            for subdir in subdirs:
+                submit(*subdir)
+
+    add_up_usage(root)
+    return root
+
+def add_up_usage(root):
+    """Fill in the cumulative size and file count of every directory below root."""
+    # Directories in breadth-first order; summing them in reverse adds every
+    # directory into its parent only after its own subtree is complete.
+    directories = [root]
+    for node in directories:
+        directories.extend(child for child in node.children if child.children is not None)
+    for node in reversed(directories):
+        node.size = sum(child.size for child in node.children)
+        node.files = sum(child.files for child in node.children)
+
+def snapshot_settings(start_path, show_hidden, exclude):
+    """Return the options a snapshot was taken with; it can only be reused with the same ones."""
+    return {"root": os.path.abspath(start_path), "show_hidden": show_hidden, "exclude": sorted(exclude)}
+
+def save_snapshot(snapshot_path, root, settings):
+    """
+    Write a DiskUsage tree to a gzip'ed JSON snapshot.
+    The tree is stored as a flat pre-order list of [depth, name, size, mtime]
+    rows (mtime is null for files, size is null for directories), which is
+    compact and can be read back without recursion however deep the tree is.
+    """
+    rows = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.children is None:
+            rows.append([depth, node.name, node.size, None])
+            continue
+        rows.append([depth, node.name, None, node.mtime])
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+
+    temp_path = f"{snapshot_path}.tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+        json.dump({"version": SNAPSHOT_VERSION, **settings, "rows": rows}, f, separators=(",", ":"))
+    os.replace(temp_path, snapshot_path)
+
+def load_snapshot(snapshot_path):
+    """Return (settings, DiskUsage tree) from a snapshot file, or (None, None) if it is missing or unreadable."""
+    try:
+        with gzip.open(snapshot_path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError) as e:
+        print(f"dirtree: ignoring unreadable snapshot {snapshot_path}: {e}", file=sys.stderr)
+        return None, None
+    if data.get("version") != SNAPSHOT_VERSION or not data.get("rows"):
+        return None, None
+
+    root = None
+    parents = []
+    for depth, name, size, mtime in data["rows"]:
+        if size is None:
+            node = DiskUsage(name, children=[], mtime=mtime)
+        else:
+            node = DiskUsage(name, size, 1)
+        del parents[depth:]
+        if parents:
+            parents[-1].children.append(node)
+        else:
+            root = node
+        if node.children is not None:
+            parents.append(node)
+    add_up_usage(root)
+    settings = {key: data.get(key) for key in ("root", "show_hidden", "exclude")}
+    return settings, root
+
+def iter_snapshot_diff(old_root, new_root):
+    """
+    Yield (change, path, old_size, new_size) for entries that differ between two trees.
+    change is "+" for added, "-" for removed and "~" for files and directories
+    whose size changed. The contents of added or removed directories are not
+    listed separately.
+    """
+    stack = [(old_root, new_root, "")]
+    while stack:
+        old_node, new_node, rel_path = stack.pop()
+        old_children = {child.name: child for child in old_node.children}
+        new_children = {child.name: child for child in new_node.children}
+        for name in sorted(old_children.keys() | new_children.keys(), reverse=True):
+            old_child, new_child = old_children.get(name), new_children.get(name)
+            path = os.path.join(rel_path, name)
+            if old_child is not None and new_child is not None and \
+                    (old_child.children is None) != (new_child.children is None):
+                # A file replaced by a directory or the other way around
+                yield "-", path, old_child.size, None
+                yield "+", path, None, new_child.size
+            elif new_child is None:
+                yield "-", path, old_child.size, None
+            elif old_child is None:
+                yield "+", path, None, new_child.size
+            else:
+                if old_child.size != new_child.size:
+                    yield "~", path, old_child.size, new_child.size
+                if new_child.children is not None:
+                    stack.append((old_child, new_child, path))
+
+def format_snapshot_diff(changes):
+    """Yield diff lines sorted by path, followed by a summary line."""
+    counts = {"+": 0, "-": 0, "~": 0}
+    for change, path, old_size, new_size in sorted(changes, key=lambda change: (change[1], change[0] == "+")):
+        counts[change] += 1
+        if change == "+":
+            yield f"+ {path} ({format_size(new_size)})"
+        elif change == "-":
+            yield f"- {path} ({format_size(old_size)})"
+        else:
+            delta = new_size - old_size
+            sign = "+" if delta > 0 else "-"
+            yield f"~ {path} ({format_size(old_size)} -> {format_size(new_size)}, {sign}{format_size(abs(delta))})"
+    yield f"{counts['+']} added, {counts['-']} removed, {counts['~']} changed in size"
+
+def usage_label(node):
+    if node.children is None:
+        return f"{node.name} ({format_size(node.size)})"
+    return f"{node.name} ({format_size(node.size)}, {node.files} file{'' if node.files == 1 else 's'})"
+
+def iter_usage_tree(root, max_depth=None, top=None, min_size=0, sizes=True):
+    """
+    Yield the lines of a DiskUsage tree below root, largest entries first.
+    Each directory shows at most top entries of at least min_size bytes, and
+    the rest is summed up in a single line. Without sizes, entries are listed
+    by name like a plain tree.
+    """
+    def expand(node):
+        if not sizes:
+            return [(child.name, child if child.children else None)
+                    for child in sorted(node.children, key=lambda child: child.name)]
+        children = sorted(node.children, key=lambda child: (-child.size, child.name))
+        shown = [child for child in children if child.size >= min_size][:top]
+        items = [(usage_label(child), child if child.children else None) for child in shown]
+        hidden = len(children) - len(shown)
+        if hidden:
+            hidden_size = sum(child.size for child in children) - sum(child.size for child in shown)
+            items.append((f"… {hidden} more entr{'y' if hidden == 1 else 'ies'} ({format_size(hidden_size)})", None))
+        return items
+
+    yield from render_tree(expand(root), expand, max_depth)
+
+def write_lines(lines, out=None):
+    """Write lines to out (default: stdout) in large chunks instead of one write per line."""
+    out = out or sys.stdout
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= OUTPUT_CHUNK_LINES:
+            out.write("\n".join(chunk) + "\n")
+            chunk.clear()
+    if chunk:
+        out.write("\n".join(chunk) + "\n")
+
+def print_tree(start_path, show_hidden=True, max_depth=None, exclude=(), out=None):
+    write_lines(iter_tree(start_path, show_hidden, max_depth, exclude), out)
+
+def print_usage_tree(start_path, show_hidden=True, max_depth=None, exclude=(), top=None, min_size=0,
+                     jobs=DEFAULT_SIZE_JOBS, snapshot_path=None, sizes=True, out=None):
+    """
+    Scan start_path and print its disk-usage tree (or a plain tree without sizes).
+    With snapshot_path, only directories changed since the snapshot are
+    listed again, and the snapshot is then updated.
+    """
+    settings = snapshot_settings(start_path, show_hidden, exclude)
+    previous = None
+    if snapshot_path:
+        previous_settings, previous = load_snapshot(snapshot_path)
+        if previous is not None and previous_settings != settings:
+            print(f"dirtree: snapshot {snapshot_path} was taken with other options, rescanning everything",
+                  file=sys.stderr)
+            previous = None
+
+    rescanned = []
+    root = scan_usage(start_path, show_hidden, exclude, jobs, previous, rescanned)
+    if snapshot_path:
+        save_snapshot(snapshot_path, root, settings)
+        if previous is not None:
+            directories = sum(1 for _ in iter_directories(root))
+            print(f"dirtree: rescanned {len(rescanned)} of {directories} directories", file=sys.stderr)
+
+    write_lines([usage_label(root) if sizes else start_path], out)
+    write_lines(iter_usage_tree(root, max_depth, top, min_size, sizes), out)
+
+def iter_directories(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(child for child in node.children if child.children is not None)
+
+def print_snapshot_diff(old_path, new_path, out=None):
+    """Print the differences between two snapshot files. Returns False if one cannot be read."""
+    roots = []
+    for snapshot_path in (old_path, new_path):
+        _, root = load_snapshot(snapshot_path)
+        if root is None:
+            print(f"dirtree: {snapshot_path} is not a readable snapshot", file=sys.stderr)
+            return False
+        roots.append(root)
+    write_lines(format_snapshot_diff(iter_snapshot_diff(*roots)), out)
+    return True
 
 def main():
     parser = argparse.ArgumentParser(description="Print directory tree in Markdown-like style.")
     parser.add_argument("directory", nargs="?", default=".", help="Directory to list (default: current directory)")
     parser.add_argument("--show-hidden", action="store_true", help="Include hidden files and folders")
+    parser.add_argument("-L", "--max-depth", type=int, metavar="N",
+                        help="Descend at most N levels below the directory")
+    parser.add_argument("-x", "--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip entries whose name or relative path matches GLOB (repeatable)")
+    sizes = parser.add_argument_group("disk usage")
+    sizes.add_argument("--sizes", action="store_true",
+                       help="Show the cumulative size and file count of every entry, largest first")
+    sizes.add_argument("--top", type=int, metavar="N",
+                       help="With --sizes, show only the N largest entries of each directory")
+    sizes.add_argument("--min-size", type=parse_size, default=0, metavar="SIZE",
+                       help="With --sizes, hide entries smaller than SIZE (e.g. 500K, 100M, 2G)")
+    sizes.add_argument("-j", "--jobs", type=int, default=DEFAULT_SIZE_JOBS, metavar="N",
+                       help=f"With --sizes or --snapshot, scan directories on N threads (default: {DEFAULT_SIZE_JOBS})")
+    snapshots = parser.add_argument_group("snapshots")
+    snapshots.add_argument("--snapshot", metavar="FILE",
+                           help="Reuse the scan saved in FILE for directories whose mtime is unchanged, "
+                                "then update FILE")
+    snapshots.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"),
+                           help="Show entries added, removed or changed in size between two snapshot files")
     args = parser.parse_args()
+    if args.max_depth is not None and args.max_depth < 1:
+        parser.error("--max-depth must be at least 1")
+    if args.top is not None and args.top < 1:
+        parser.error("--top must be at least 1")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if not args.sizes and (args.top is not None or args.min_size):
+        parser.error("--top and --min-size require --sizes")
+
+    if args.diff:
+        if not print_snapshot_diff(*args.diff):
+            sys.exit(1)
+        return
+    try:
+        with os.scandir(args.directory):
+            pass
+    except OSError as e:
+        print(f"dirtree: cannot read {args.directory}: {e.strerror}", file=sys.stderr)
+        sys.exit(2)
+    if args.sizes or args.snapshot:
+        print_usage_tree(args.directory, show_hidden=args.show_hidden, max_depth=args.max_depth,
+                         exclude=args.exclude, top=args.top, min_size=args.min_size, jobs=args.jobs,
+                         snapshot_path=args.snapshot, sizes=args.sizes)
+        return
 
     print(args.directory)
-    print_tree(args.directory, show_hidden=args.show_hidden)
+    print_tree(args.directory, show_hidden=args.show_hidden, max_depth=args.max_depth, exclude=args.exclude)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
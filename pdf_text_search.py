@@ -1,71 +1,736 @@
-import PyPDF2
 import os
 import re
+import io
+import sys
+import json
+import mmap
+import time
+import zlib
+import signal
+import socket
+import hashlib
 import argparse
-from typing import List, Tuple
+import threading
+import socketserver
+from functools import partial
+from bisect import bisect_right
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 import colorama
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract all text from a PDF file."""
-    try:
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ""
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "pdf_text_search",
+)
+DEFAULT_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "extractions.sqlite3")
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_CACHE_DIR, "index.sqlite3")
+DEFAULT_CACHE_SIZE_MB = 512
+DEFAULT_BACKEND = "pypdf2"
+# Text of longer documents is streamed but not kept for the cache, so memory stays bounded
+MAX_CACHED_DOCUMENT_CHARS = 32 * 1024 * 1024
+# Text without sentence boundaries (tables, listings) is split at the next page break beyond this
+MAX_SENTENCE_CHARS = 64 * 1024
+# Bumped whenever the index layout changes; older indexes are rebuilt from scratch
+INDEX_FORMAT_VERSION = 2
+# Values bound per IN (...) query, well below SQLite's parameter limit
+SQL_CHUNK_SIZE = 500
+DEFAULT_SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or DEFAULT_CACHE_DIR, "pdf_text_search.sock")
+DEFAULT_POLL_SECONDS = 2.0
+# With --jobs, at most this many files per worker are queued or held ahead of the output
+WINDOW_PER_JOB = 2
+# Replies are written in batches of about this size instead of one send per match
+REPLY_BUFFER_BYTES = 64 * 1024
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+WORD = re.compile(r'\w+')
+
+class TermMatcher:
+    """
+    Case-insensitive matcher for one or more literal terms or regular expressions.
+    All terms are combined into a single alternation compiled once, so text is
+    scanned a single time however many terms there are. The per-term patterns
+    only run on sentences that already matched, to attribute hits to terms.
+    """
+
+    def __init__(self, terms: List[str], regex: bool = False):
+        self.terms = list(terms)
+        self.regex = regex
+        sources = [term if regex else re.escape(term) for term in self.terms]
+        self.pattern = re.compile("|".join(f"(?:{source})" for source in sources), re.IGNORECASE)
+        self.term_patterns = [re.compile(source, re.IGNORECASE) for source in sources]
+
+    def terms_in(self, sentence: str) -> Tuple[str, ...]:
+        """Return the terms that occur in a sentence."""
+        if len(self.terms) == 1:
+            return tuple(self.terms)
+        return tuple(term for term, pattern in zip(self.terms, self.term_patterns) if pattern.search(sentence))
+
+class ExtractionCache:
+    """
+    Persistent cache of per-page PDF text, keyed by file path, size and mtime
+    (and optionally a SHA-256 of the content). Least recently used entries are
+    evicted once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_path: str, max_bytes: int, verify_hash: bool = False, rebuild: bool = False,
+                 backend: str = DEFAULT_BACKEND):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.verify_hash = verify_hash
+        self.rebuild = rebuild
+        self.backend = backend
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT, "
+            "pages BLOB NOT NULL, bytes INTEGER NOT NULL, last_used REAL NOT NULL, "
+            f"backend TEXT NOT NULL DEFAULT '{DEFAULT_BACKEND}')"
+        )
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(extractions)")}
+        if "backend" not in columns:
+            self.connection.execute(
+                f"ALTER TABLE extractions ADD COLUMN backend TEXT NOT NULL DEFAULT '{DEFAULT_BACKEND}'"
+            )
+
+    def get(self, pdf_path: str) -> Optional[List[str]]:
+        """Return cached pages for an unchanged file extracted by this backend, or None on a miss."""
+        if self.rebuild:
+            return None
+        path = os.path.abspath(pdf_path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, sha256, pages FROM extractions WHERE path = ? AND backend = ?",
+            (path, self.backend),
+        ).fetchone()
+        if row is None:
+            return None
+
+        size, mtime_ns, sha256, pages = row
+        stat = os.stat(path)
+        if self.verify_hash:
+            if sha256 != file_sha256(path):
+                return None
+        elif (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+
+        self.connection.execute(
+            "UPDATE extractions SET size = ?, mtime_ns = ?, last_used = ? WHERE path = ?",
+            (stat.st_size, stat.st_mtime_ns, time.time(), path),
+        )
+        return json.loads(zlib.decompress(pages))
+
+    def put(self, pdf_path: str, pages: List[str]) -> None:
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        blob = zlib.compress(json.dumps(pages).encode("utf-8"))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extractions (path, size, mtime_ns, sha256, pages, bytes, last_used, backend) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                stat.st_size,
+                stat.st_mtime_ns,
+                file_sha256(path) if self.verify_hash else None,
+                blob,
+                len(blob),
+                time.time(),
+                self.backend,
+            ),
+        )
+
+    def flush(self) -> None:
+        """Evict least recently used entries beyond the size limit and save the cache."""
+        total = self.connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM extractions").fetchone()[0]
+        if total > self.max_bytes:
+            evicted = []
+            for path, size in self.connection.execute("SELECT path, bytes FROM extractions ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                evicted.append((path,))
+                total -= size
+            self.connection.executemany("DELETE FROM extractions WHERE path = ?", evicted)
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Flush and close the cache."""
+        self.flush()
+        self.connection.close()
+
+def file_sha256(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SearchIndex:
+    """
+    On-disk inverted index mapping lowercased words to the sentences (document,
+    start page, page breaks and character offset) that contain them. Sentences
+    come from iter_sentence_stretches, like a scan's, so they may span pages.
+    Documents are re-indexed only when their size or mtime changes.
+    """
+
+    def __init__(self, index_path: str):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(index_path)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < INDEX_FORMAT_VERSION:
+            # Older indexes split sentences at page breaks; drop them so every PDF is re-indexed
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS terms;"
+                "DROP TABLE IF EXISTS sentences; DROP TABLE IF EXISTS documents;"
+                f"PRAGMA user_version = {INDEX_FORMAT_VERSION};"
+            )
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS sentences ("
+            "id INTEGER PRIMARY KEY, doc_id INTEGER NOT NULL, page INTEGER NOT NULL, offset INTEGER NOT NULL, "
+            "page_breaks TEXT NOT NULL, text TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS sentences_doc ON sentences (doc_id);"
+            "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term_id INTEGER NOT NULL, sentence_id INTEGER NOT NULL, PRIMARY KEY (term_id, sentence_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_sentence ON postings (sentence_id);"
+        )
+        self.term_ids = None
+
+    def is_current(self, pdf_path: str) -> bool:
+        """Return True if the PDF is indexed and unchanged since."""
+        stat = os.stat(pdf_path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns FROM documents WHERE path = ?", (os.path.abspath(pdf_path),)
+        ).fetchone()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def remove_document(self, path: str) -> None:
+        row = self.connection.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self.connection.execute(
+            "DELETE FROM postings WHERE sentence_id IN (SELECT id FROM sentences WHERE doc_id = ?)", row
+        )
+        self.connection.execute("DELETE FROM sentences WHERE doc_id = ?", row)
+        self.connection.execute("DELETE FROM documents WHERE id = ?", row)
+
+    def add_document(self, pdf_path: str, pages: List[str]) -> None:
+        """Index (or re-index) one PDF from its per-page text."""
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        self.remove_document(path)
+        if self.term_ids is None:
+            self.term_ids = dict(self.connection.execute("SELECT term, id FROM terms"))
+
+        doc_id = self.connection.execute(
+            "INSERT INTO documents (path, size, mtime_ns) VALUES (?, ?, ?)", (path, stat.st_size, stat.st_mtime_ns)
+        ).lastrowid
+        postings = []
+        stretch_start = 0
+        for text, sentences, page_starts, page_numbers in iter_sentence_stretches(pages):
+            for offset, sentence in sentences:
+                page_index = bisect_right(page_starts, offset) - 1
+                # Offsets within the sentence where each following page starts
+                page_breaks = []
+                for start in page_starts[page_index + 1:]:
+                    if start >= offset + len(sentence):
+                        break
+                    page_breaks.append(str(start - offset))
+                sentence_id = self.connection.execute(
+                    "INSERT INTO sentences (doc_id, page, offset, page_breaks, text) VALUES (?, ?, ?, ?, ?)",
+                    (doc_id, page_numbers[page_index], stretch_start + offset, ",".join(page_breaks), sentence),
+                ).lastrowid
+                for term in set(WORD.findall(sentence.lower())):
+                    term_id = self.term_ids.get(term)
+                    if term_id is None:
+                        term_id = self.connection.execute("INSERT INTO terms (term) VALUES (?)", (term,)).lastrowid
+                        self.term_ids[term] = term_id
+                    postings.append((term_id, sentence_id))
+            stretch_start += len(text)
+        self.connection.executemany("INSERT INTO postings VALUES (?, ?)", postings)
+
+    def remove_missing(self, folder: str, present_paths: List[str], recursive: bool = True) -> int:
+        """
+        Drop indexed documents under folder that are no longer present. Without
+        recursive, only documents directly in folder are considered, so PDFs
+        indexed from its subfolders by an earlier recursive run are kept.
+        """
+        folder = os.path.abspath(folder)
+        prefix = os.path.join(folder, "")
+        present = {os.path.abspath(path) for path in present_paths}
+        stale = [
+            path for (path,) in self.connection.execute(
+                "SELECT path FROM documents WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            )
+            if path not in present and (recursive or os.path.dirname(path) == folder)
+        ]
+        for path in stale:
+            self.remove_document(path)
+        return len(stale)
+
+    def words_like(self, token: str, starts_word: bool, ends_word: bool) -> Iterator[int]:
+        """
+        Yield ids of indexed words that can contain a token of a search term: the
+        word itself when the term shows it whole, words starting with it when only
+        its start is known, found through the terms index, and otherwise any word
+        containing it, which scans the whole vocabulary.
+        """
+        if starts_word and ends_word:
+            query, parameters = "SELECT id FROM terms WHERE term = ?", (token,)
+        elif starts_word:
+            # Words with this prefix sort between the token and the token with its last character bumped
+            query = "SELECT id FROM terms WHERE term >= ? AND term < ?"
+            parameters = (token, token[:-1] + chr(ord(token[-1]) + 1))
+        else:
+            query, parameters = "SELECT id FROM terms WHERE instr(term, ?) > 0", (token,)
+        for (term_id,) in self.connection.execute(query, parameters):
+            yield term_id
+
+    def candidate_sentences(self, term: str) -> Optional[set]:
+        """
+        Return ids of sentences that may contain a literal term, or None if the
+        term has no words to look up. A word of the term that is followed by
+        another character of the term must be the start of an indexed word, and
+        one between two such characters a whole indexed word, so they are looked up
+        through the terms index. Only when no word of the term is bounded that way
+        (a single bare word, which may occur inside any longer word) is the
+        vocabulary scanned, which is O(vocabulary) per query.
+        """
+        lowered = term.lower()
+        tokens = {}
+        for match in WORD.finditer(lowered):
+            bounds = (match.start() > 0, match.end() < len(lowered))
+            tokens[match.group()] = max(tokens.get(match.group(), bounds), bounds)
+        if not tokens:
+            return None
+        bounded = {token: bounds for token, bounds in tokens.items() if bounds[0]}
+        candidate_ids = None
+        for token, (starts_word, ends_word) in (bounded or tokens).items():
+            term_ids = list(self.words_like(token, starts_word, ends_word))
+            sentence_ids = set()
+            for chunk in iter_chunks(term_ids):
+                sentence_ids.update(sentence_id for (sentence_id,) in self.connection.execute(
+                    f"SELECT sentence_id FROM postings WHERE term_id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            candidate_ids = sentence_ids if candidate_ids is None else candidate_ids & sentence_ids
+            if not candidate_ids:
+                break
+        return candidate_ids
+
+    def search(self, matcher: TermMatcher, pdf_paths: List[str]) -> dict:
+        """
+        Return {pdf_path: [(sentence, page_number, terms), ...]} for the given indexed PDFs.
+        Regular expressions cannot use the postings, so they are checked against
+        every stored sentence of those PDFs, streamed from the index, which still
+        avoids re-reading any PDF.
+        """
+        paths_by_abspath = {os.path.abspath(path): path for path in pdf_paths}
+        doc_ids = []
+        for chunk in iter_chunks(sorted(paths_by_abspath)):
+            doc_ids.extend(doc_id for (doc_id,) in self.connection.execute(
+                f"SELECT id FROM documents WHERE path IN ({','.join('?' * len(chunk))}) ORDER BY path", chunk
+            ))
+        if not doc_ids:
+            return {}
+
+        candidate_ids = set()
+        for term in matcher.terms:
+            term_candidates = None if matcher.regex else self.candidate_sentences(term)
+            if term_candidates is None:
+                candidate_ids = None
+                break
+            candidate_ids |= term_candidates
+
+        query = ("SELECT d.path, s.offset, s.page, s.page_breaks, s.text "
+                 "FROM sentences s JOIN documents d ON d.id = s.doc_id")
+        if candidate_ids is None:
+            rows = chain.from_iterable(
+                self.connection.execute(
+                    f"{query} WHERE s.doc_id IN ({','.join('?' * len(chunk))}) ORDER BY d.path, s.offset", chunk
+                )
+                for chunk in iter_chunks(doc_ids)
+            )
+        else:
+            wanted = set(doc_ids)
+            rows = []
+            for chunk in iter_chunks(sorted(candidate_ids)):
+                rows.extend(self.connection.execute(
+                    f"SELECT d.path, s.offset, s.page, s.page_breaks, s.text, s.doc_id "
+                    f"FROM sentences s JOIN documents d ON d.id = s.doc_id "
+                    f"WHERE s.id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            rows = sorted(row[:5] for row in rows if row[5] in wanted)
+
+        results = {}
+        for path, _, page_num, page_breaks, sentence in rows:
+            match = matcher.pattern.search(sentence)
+            if match:
+                # Report the page of the first hit, as a scan does
+                if page_breaks:
+                    page_num += bisect_right([int(start) for start in page_breaks.split(",")], match.start())
+                results.setdefault(paths_by_abspath[path], []).append(
+                    (sentence, page_num, matcher.terms_in(sentence))
+                )
+        return results
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
+
+def iter_chunks(values: List, size: int = SQL_CHUNK_SIZE) -> Iterator[List]:
+    """Yield consecutive slices of values, small enough to bind as the parameters of one IN (...)."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def split_sentences(text: str) -> Iterator[Tuple[int, str]]:
+    """Yield (offset, sentence) pairs for the non-empty, stripped sentences of a text."""
+    start = 0
+    for boundary in [*SENTENCE_BOUNDARY.finditer(text), None]:
+        end = boundary.start() if boundary else len(text)
+        segment = text[start:end]
+        sentence = segment.strip()
+        if sentence:
+            yield start + len(segment) - len(segment.lstrip()), sentence
+        if boundary:
+            start = boundary.end()
+
+class PdfBackend:
+    """
+    Text extraction engine. iter_pages yields the text of one page at a time,
+    so a consumer that stops early never extracts the remaining pages.
+    """
+    name = ""
+    install_hint = ""
+
+    def available(self) -> bool:
+        return True
+
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        raise NotImplementedError
+
+class PyPDF2Backend(PdfBackend):
+    """Pure-Python extraction with PyPDF2 over a memory-mapped file, so pages are read on demand."""
+    name = "pypdf2"
+
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        import PyPDF2  # Deferred: importing it takes longer than a whole --connect query
+
+        with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            reader = PyPDF2.PdfReader(mapped)
             for page in reader.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + " "
-            return text
-    except Exception as e:
-        print(f"Error reading {pdf_path}: {e}")
-        return ""
+                yield page.extract_text() or ""
 
-def find_sentences_with_text(text: str, search_term: str) -> List[Tuple[str, int]]:
+class PdfiumBackend(PdfBackend):
+    """Extraction with PDFium through pypdfium2, typically many times faster than PyPDF2."""
+    name = "pdfium"
+    install_hint = "pip install pypdfium2"
+
+    def available(self) -> bool:
+        try:
+            import pypdfium2  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        import pypdfium2
+
+        document = pypdfium2.PdfDocument(pdf_path)
+        try:
+            for page_index in range(len(document)):
+                page = document[page_index]
+                text_page = page.get_textpage()
+                try:
+                    yield text_page.get_text_range()
+                finally:
+                    text_page.close()
+                    page.close()
+        finally:
+            document.close()
+
+class PdftotextBackend(PdfBackend):
     """
-    Find sentences containing the search term and their page numbers.
-    Returns list of (sentence, page_number) tuples.
+    Extraction with poppler's pdftotext command, read from its output as it is
+    produced; pages are separated by form feeds.
     """
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    matches = []
-    total_length = len(text)
-    page_count = estimate_page_count(text)
-    
-    for sentence in sentences:
-        if search_term.lower() in sentence.lower():
-            position = text.lower().find(sentence.lower())
-            if position != -1 and total_length > 0:
-                page_num = int((position / total_length) * page_count) + 1
-                matches.append((sentence.strip(), page_num))
-    
-    return matches
+    name = "pdftotext"
+    install_hint = "install poppler-utils"
 
-def estimate_page_count(text: str) -> int:
-    """Estimate number of pages based on text length (rough approximation)."""
-    chars_per_page = 2000
-    return max(1, len(text) // chars_per_page + 1)
+    def available(self) -> bool:
+        import shutil
 
-def search_pdfs(pdf_paths: List[str], search_term: str) -> dict:
-    """Search multiple PDF files for the search term."""
-    results = {}
-    
+        return shutil.which("pdftotext") is not None
+
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        import subprocess
+
+        process = subprocess.Popen(["pdftotext", "-q", "-enc", "UTF-8", pdf_path, "-"],
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            output = io.TextIOWrapper(process.stdout, encoding="utf-8", errors="replace")
+            pending = ""
+            while chunk := output.read(1 << 16):
+                *pages, pending = (pending + chunk).split("\f")
+                yield from pages
+            if pending:
+                yield pending
+            if process.wait() != 0:
+                raise RuntimeError(f"pdftotext exited with status {process.returncode}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend(), PdfiumBackend(), PdftotextBackend())}
+# Fastest first, for --backend auto
+BACKEND_PREFERENCE = ("pdfium", "pdftotext", "pypdf2")
+
+def resolve_backend(name: str) -> str:
+    """Return the backend to use for a --backend value, picking the fastest installed one for 'auto'."""
+    if name == "auto":
+        return next(candidate for candidate in BACKEND_PREFERENCE if BACKENDS[candidate].available())
+    if not BACKENDS[name].available():
+        raise ValueError(f"the {name} backend is not available ({BACKENDS[name].install_hint})")
+    return name
+
+def iter_pdf_pages(pdf_path: str, backend: str = DEFAULT_BACKEND) -> Iterator[str]:
+    """Yield the text of each page of a PDF file lazily, raising on unreadable files."""
+    return BACKENDS[backend].iter_pages(pdf_path)
+
+def read_pdf_pages(pdf_path: str, backend: str = DEFAULT_BACKEND) -> List[str]:
+    """Extract the text of every page of a PDF file, raising on unreadable files."""
+    return list(iter_pdf_pages(pdf_path, backend))
+
+def iter_document_pages(pdf_path: str, cache: Optional[ExtractionCache] = None,
+                        backend: str = DEFAULT_BACKEND) -> Iterator[str]:
+    """
+    Yield page texts from the cache, or lazily from the PDF. A PDF is only
+    cached once every page has been read, so stopping early caches nothing,
+    and neither does a document with more than MAX_CACHED_DOCUMENT_CHARS of text.
+    """
+    pages = cache.get(pdf_path) if cache is not None else None
+    if pages is not None:
+        yield from pages
+        return
+
+    pages = []
+    total_chars = 0
+    for page_text in iter_pdf_pages(pdf_path, backend):
+        total_chars += len(page_text)
+        if total_chars <= MAX_CACHED_DOCUMENT_CHARS:
+            pages.append(page_text)
+        yield page_text
+    if cache is not None and total_chars <= MAX_CACHED_DOCUMENT_CHARS:
+        cache.put(pdf_path, pages)
+
+def iter_sentence_stretches(pages: Iterable[str]
+                            ) -> Iterator[Tuple[str, List[Tuple[int, str]], List[int], List[int]]]:
+    """
+    Yield (text, sentences, page_starts, page_numbers) for consecutive stretches
+    of the joined page text, reading pages only as far as the consumer asks for.
+    A stretch ends where the last sentence of the latest page starts, since that
+    sentence may continue on the next page. Only the text each page adds is
+    searched for sentence boundaries, and text without any is flushed at a page
+    break once it exceeds MAX_SENTENCE_CHARS, so the work is linear in the
+    document and at most that much text (plus one page) is held at a time.
+    """
+    buffer = ""
+    content_end = 0  # End of the last non-whitespace text in buffer
+    page_starts: List[int] = []
+    page_numbers: List[int] = []
+
+    for page_num, page_text in enumerate(pages, 1):
+        page_starts.append(len(buffer))
+        page_numbers.append(page_num)
+        scan_from = content_end
+        piece = page_text + " "
+        if piece.strip():
+            content_end = len(buffer) + len(piece.rstrip())
+        buffer += piece
+
+        carry_offset = 0
+        for boundary in SENTENCE_BOUNDARY.finditer(buffer, scan_from):
+            if boundary.end() < len(buffer):
+                carry_offset = boundary.end()
+        if carry_offset:
+            stretch = buffer[:carry_offset]
+            yield stretch, list(split_sentences(stretch)), page_starts, page_numbers
+            first_kept = bisect_right(page_starts, carry_offset) - 1
+            buffer = buffer[carry_offset:]
+            content_end -= carry_offset
+            page_starts = [0] + [start - carry_offset for start in page_starts[first_kept + 1:]]
+            page_numbers = page_numbers[first_kept:]
+        elif len(buffer) > MAX_SENTENCE_CHARS:
+            yield buffer, list(split_sentences(buffer)), page_starts, page_numbers
+            buffer = ""
+            content_end = 0
+            page_starts = []
+            page_numbers = []
+
+    if buffer:
+        yield buffer, list(split_sentences(buffer)), page_starts, page_numbers
+
+def iter_sentence_matches(pages: Iterable[str], matcher: TermMatcher) -> Iterator[Tuple[str, int, Tuple[str, ...]]]:
+    """
+    Yield (sentence, page_number, terms) for sentences matching any term,
+    reading pages only as far as the consumer asks for. Each stretch from
+    iter_sentence_stretches is scanned once with the combined pattern, and
+    every hit is mapped to its sentence and page through sorted offset tables.
+    """
+    for text, sentences, page_starts, page_numbers in iter_sentence_stretches(pages):
+        yield from match_sentences(text, sentences, matcher, page_starts, page_numbers)
+
+def match_sentences(text: str, sentences: List[Tuple[int, str]], matcher: TermMatcher,
+                    page_starts: List[int], page_numbers: List[int],
+                    sentence_starts: Optional[List[int]] = None) -> Iterator[Tuple[str, int, Tuple[str, ...]]]:
+    """
+    Yield (sentence, page_number, terms) for each sentence of text that matches.
+    sentence_starts, the offsets of sentences, is derived when not given.
+    """
+    if sentence_starts is None:
+        sentence_starts = [offset for offset, _ in sentences]
+
+    match = matcher.pattern.search(text)
+    while match:
+        position = match.start()
+        index = bisect_right(sentence_starts, position) - 1
+        next_position = position + 1
+        if index >= 0:
+            offset, sentence = sentences[index]
+            sentence_end = offset + len(sentence)
+            if match.end() <= sentence_end:
+                yield sentence, page_numbers[bisect_right(page_starts, position) - 1], matcher.terms_in(sentence)
+                next_position = sentence_end
+        match = matcher.pattern.search(text, next_position)
+
+def extract_and_search(pdf_path: str, matcher: TermMatcher, limit: Optional[int] = None,
+                       backend: str = DEFAULT_BACKEND
+                       ) -> Tuple[Optional[List[str]], List[Tuple[str, int, Tuple[str, ...]]], Optional[str]]:
+    """
+    Worker-side extraction and matching for one PDF, stopping after limit matches.
+    Returns (pages, matches, error) so the parent can cache pages and report
+    errors itself; pages is None unless the whole document was read and its
+    text fits within MAX_CACHED_DOCUMENT_CHARS.
+    """
+    pages = []
+    total_chars = 0
+
+    def reading() -> Iterator[str]:
+        nonlocal total_chars
+        for page_text in iter_pdf_pages(pdf_path, backend):
+            total_chars += len(page_text)
+            if total_chars <= MAX_CACHED_DOCUMENT_CHARS:
+                pages.append(page_text)
+            yield page_text
+
+    try:
+        matches = list(islice(iter_sentence_matches(reading(), matcher), limit))
+    except Exception as e:
+        return None, [], f"Error reading {pdf_path}: {e}"
+    complete = (limit is None or len(matches) < limit) and total_chars <= MAX_CACHED_DOCUMENT_CHARS
+    return pages if complete else None, matches, None
+
+def extract_pages_worker(pdf_path: str, backend: str = DEFAULT_BACKEND) -> Tuple[Optional[List[str]], Optional[str]]:
+    """Worker-side extraction for one PDF, returning (pages, error)."""
+    try:
+        return read_pdf_pages(pdf_path, backend), None
+    except Exception as e:
+        return None, f"Error reading {pdf_path}: {e}"
+
+def iter_matches(pdf_paths: List[str], matcher: TermMatcher, cache: Optional[ExtractionCache] = None,
+                 jobs: int = 1, ordered: bool = False, per_file_limit: Optional[int] = None,
+                 backend: str = DEFAULT_BACKEND) -> Iterator[Tuple[str, str, int, Tuple[str, ...]]]:
+    """
+    Yield (pdf_path, sentence, page_number, terms) for every match as soon as it is found.
+    Sequentially, pages are read lazily, so a consumer that stops early (or a
+    per_file_limit) stops further page extraction. With jobs > 1, uncached PDFs
+    are extracted and matched in a process pool, with at most WINDOW_PER_JOB
+    files per worker in flight, and files arrive in completion order unless
+    ordered is set. Progress and errors go to stderr so stdout only carries results.
+    """
+    valid_paths = []
     for pdf_path in pdf_paths:
         if not os.path.exists(pdf_path):
-            print(f"File not found: {pdf_path}")
-            continue
-            
-        if not pdf_path.lower().endswith('.pdf'):
-            print(f"Skipping non-PDF file: {pdf_path}")
-            continue
-            
-        print(f"Searching in: {pdf_path}")
-        text = extract_text_from_pdf(pdf_path)
-        if not text:
-            continue
-            
-        matches = find_sentences_with_text(text, search_term)
-        if matches:
-            results[pdf_path] = matches
-            
-    return results
+            print(f"File not found: {pdf_path}", file=sys.stderr)
+        elif not pdf_path.lower().endswith('.pdf'):
+            print(f"Skipping non-PDF file: {pdf_path}", file=sys.stderr)
+        else:
+            valid_paths.append(pdf_path)
+
+    if jobs <= 1:
+        for pdf_path in valid_paths:
+            print(f"Searching in: {pdf_path}", file=sys.stderr)
+            matches = iter_sentence_matches(iter_document_pages(pdf_path, cache, backend), matcher)
+            try:
+                for sentence, page_num, terms in islice(matches, per_file_limit):
+                    yield pdf_path, sentence, page_num, terms
+            except Exception as e:
+                print(f"Error reading {pdf_path}: {e}", file=sys.stderr)
+        return
+
+    from collections import deque
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    def searched(done: int, pdf_path: str, task) -> Iterator[Tuple[str, str, int, Tuple[str, ...]]]:
+        """Yield the matches of one file, whose task is its cached pages or a finished future."""
+        print(f"Searched {pdf_path} ({done}/{len(valid_paths)})", file=sys.stderr)
+        if isinstance(task, list):
+            matches = islice(iter_sentence_matches(task, matcher), per_file_limit)
+        else:
+            pages, matches, error = task.result()
+            if error:
+                print(error, file=sys.stderr)
+                return
+            if cache is not None and pages is not None:
+                cache.put(pdf_path, pages)
+        for sentence, page_num, terms in matches:
+            yield pdf_path, sentence, page_num, terms
+
+    # Files are only looked up in the cache or submitted as their turn comes, and at
+    # most window are in flight, so neither the cache nor the queue is loaded up front
+    window = jobs * WINDOW_PER_JOB
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        done = 0
+        if ordered:
+            queued = deque()
+            for pdf_path in valid_paths:
+                pages = cache.get(pdf_path) if cache is not None else None
+                if pages is None:
+                    pages = executor.submit(extract_and_search, pdf_path, matcher, per_file_limit, backend)
+                queued.append((pdf_path, pages))
+                # Report finished files at the head of the queue, and wait for it once the window is full
+                while queued and (len(queued) >= window or isinstance(queued[0][1], list) or queued[0][1].done()):
+                    done += 1
+                    yield from searched(done, *queued.popleft())
+            while queued:
+                done += 1
+                yield from searched(done, *queued.popleft())
+            return
+
+        pending = {}
+        for pdf_path in valid_paths:
+            pages = cache.get(pdf_path) if cache is not None else None
+            if pages is not None:
+                done += 1
+                yield from searched(done, pdf_path, pages)
+                continue
+            while len(pending) >= window:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done += 1
+                    yield from searched(done, pending.pop(future), future)
+            pending[executor.submit(extract_and_search, pdf_path, matcher, per_file_limit, backend)] = pdf_path
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += 1
+                yield from searched(done, pending.pop(future), future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 def get_pdf_files_from_folder(folder_path: str, recursive: bool) -> List[str]:
     """Get all PDF files from a folder, optionally searching subfolders."""
@@ -85,10 +750,8 @@ def get_pdf_files_from_folder(folder_path: str, recursive: bool) -> List[str]:
         print(f"Error accessing folder {folder_path}: {e}")
     return pdf_files
 
-def highlight_text(sentence: str, search_term: str, color: str, style: str) -> str:
-    """Highlight the search term in the sentence using colorama color and style codes."""
-    # Initialize colorama (safe to call multiple times)
-    colorama.init(autoreset=True)
+class Highlighter:
+    """Highlight matches of a compiled pattern using colorama color and style codes."""
 
     # Colorama color codes
     color_codes = {
@@ -104,67 +767,576 @@ def highlight_text(sentence: str, search_term: str, color: str, style: str) -> s
         'bold': colorama.Style.BRIGHT,
         'underline': '\033[4m'  # ANSI code for underline
     }
-    color_code = color_codes.get(color.lower(), colorama.Fore.RED)
-    style_code = style_codes.get(style.lower(), '')
-    reset_code = colorama.Style.RESET_ALL
 
-    def repl(match):
-        return f"{style_code}{color_code}{match.group(0)}{reset_code}"
+    def __init__(self, pattern: re.Pattern, color: str, style: str):
+        self.pattern = pattern
+        color_code = self.color_codes.get(color.lower(), colorama.Fore.RED)
+        style_code = self.style_codes.get(style.lower(), '')
+        self.prefix = f"{style_code}{color_code}"
+        self.reset_code = colorama.Style.RESET_ALL
 
-    pattern = re.compile(re.escape(search_term), re.IGNORECASE)
-    return pattern.sub(repl, sentence)
+    def __call__(self, sentence: str) -> str:
+        return self.pattern.sub(lambda match: f"{self.prefix}{match.group(0)}{self.reset_code}", sentence)
 
-def main():
-    parser = argparse.ArgumentParser(description="Search for text in PDF files and display sentences containing matches.")
-    parser.add_argument("search_term", help="Text to search for in the PDFs")
-    parser.add_argument("paths", nargs='+', help="PDF files or folders to search (space-separated)")
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the extraction cache and worker options shared by search and index."""
     parser.add_argument("-r", "--recursive", action="store_true", 
                        help="Search folders recursively (include subfolders)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                       help="Extract PDFs in N worker processes (default: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Do not read or write the extracted-text cache")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                       help="Re-extract every PDF and refresh its cache entry")
+    parser.add_argument("--verify-hash", action="store_true",
+                       help="Validate cache entries by content hash instead of size and mtime")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH,
+                       help=f"Extracted-text cache file (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE_MB,
+                       help=f"Maximum cache size in MB before least recently used entries are evicted (default: {DEFAULT_CACHE_SIZE_MB})")
+    parser.add_argument("--index-path", default=DEFAULT_INDEX_PATH,
+                       help=f"Inverted index file (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=["auto", *BACKENDS],
+                       help=f"Text extraction engine; 'auto' picks the fastest one installed "
+                            f"(default: {DEFAULT_BACKEND})")
+
+def open_cache(args: argparse.Namespace) -> Optional[ExtractionCache]:
+    if args.no_cache:
+        return None
+    return ExtractionCache(args.cache_path, args.cache_size * 1024 * 1024,
+                           verify_hash=args.verify_hash, rebuild=args.rebuild_cache, backend=args.backend)
+
+def select_backend(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Resolve args.backend to an installed engine, exiting with a usage error if it is missing."""
+    try:
+        args.backend = resolve_backend(args.backend)
+    except ValueError as e:
+        parser.error(str(e))
+
+def collect_pdf_files(paths: List[str], recursive: bool) -> List[str]:
+    """Expand files and folders into a de-duplicated list of PDF paths."""
+    pdf_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdf_files.extend(get_pdf_files_from_folder(path, recursive))
+        elif os.path.isfile(path):
+            pdf_files.append(path)
+        else:
+            print(f"Invalid path: {path}")
+    return list(dict.fromkeys(pdf_files))  # Remove duplicates
+
+def index_main(argv: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="pdf_text_search.py index",
+        description="Build or incrementally update the inverted index for PDF files and folders.")
+    parser.add_argument("paths", nargs='+', help="PDF files or folders to index (space-separated)")
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    select_backend(parser, args)
+
+    pdf_files = collect_pdf_files(args.paths, args.recursive)
+    index = SearchIndex(args.index_path)
+    cache = open_cache(args)
+    try:
+        removed = sum(
+            index.remove_missing(path, pdf_files, args.recursive) for path in args.paths if os.path.isdir(path)
+        )
+        stale = [pdf_path for pdf_path in pdf_files if not index.is_current(pdf_path)]
+        pending = []
+        for pdf_path in stale:
+            pages = cache.get(pdf_path) if cache is not None else None
+            if pages is None:
+                pending.append(pdf_path)
+            else:
+                index.add_document(pdf_path, pages)
+
+        if args.jobs > 1 and len(pending) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                extracted = zip(pending, executor.map(partial(extract_pages_worker, backend=args.backend), pending))
+                failed = index_extracted(index, cache, extracted)
+        else:
+            extracted = ((path, extract_pages_worker(path, args.backend)) for path in pending)
+            failed = index_extracted(index, cache, extracted)
+    finally:
+        index.close()
+        if cache is not None:
+            cache.close()
+
+    print(f"Indexed {len(stale) - failed} new or changed PDFs, "
+          f"{len(pdf_files) - len(stale)} unchanged, {removed} removed.")
+
+def index_extracted(index: SearchIndex, cache: Optional[ExtractionCache], extracted) -> int:
+    """Add freshly extracted PDFs to the index and cache; returns the number of failures."""
+    failed = 0
+    for pdf_path, (pages, error) in extracted:
+        print(f"Indexing: {pdf_path}", file=sys.stderr)
+        if error:
+            print(error, file=sys.stderr)
+            failed += 1
+            continue
+        if cache is not None:
+            cache.put(pdf_path, pages)
+        index.add_document(pdf_path, pages)
+    return failed
+
+class Document:
+    """
+    Text of one served PDF laid out for matching: the stretches of
+    iter_sentence_stretches with their sentence offsets, built once when the PDF
+    is loaded so a query is a single scan of text already in memory and finds
+    the same sentences as reading the PDF.
+    """
+    __slots__ = ("size", "mtime_ns", "stretches")
+
+    def __init__(self, size: int, mtime_ns: int, pages: List[str]):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.stretches = [
+            (text, sentences, page_starts, page_numbers, [offset for offset, _ in sentences])
+            for text, sentences, page_starts, page_numbers in iter_sentence_stretches(pages)
+        ]
+
+    def matches(self, matcher: TermMatcher) -> Iterator[Tuple[str, int, Tuple[str, ...]]]:
+        for text, sentences, page_starts, page_numbers, sentence_starts in self.stretches:
+            yield from match_sentences(text, sentences, matcher, page_starts, page_numbers, sentence_starts)
+
+def in_scope(pdf_path: str, scope: str, recursive: bool) -> bool:
+    """Whether a search of scope, an absolute file or folder path, covers pdf_path."""
+    if pdf_path == scope:
+        return True
+    if recursive:
+        return pdf_path.startswith(os.path.join(scope, ""))
+    return os.path.dirname(pdf_path) == scope
+
+class SearchServer:
+    """
+    In-memory corpus behind the serve command. A watcher thread polls the served
+    paths for added, changed and removed PDFs and swaps their Documents in and
+    out; queries run over a snapshot of the documents, so they never wait for
+    extraction.
+    """
+
+    def __init__(self, paths: List[str], args: argparse.Namespace):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.args = args
+        self.documents = {}
+        self.failed = {}
+        self.missing = set()
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.stopping = threading.Event()
+
+    def list_files(self) -> dict:
+        """Return {pdf_path: (size, mtime_ns)} for the PDFs currently under the served paths."""
+        files = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                candidates = get_pdf_files_from_folder(path, self.args.recursive)
+            elif os.path.isfile(path):
+                candidates = [path]
+            else:
+                if path not in self.missing:
+                    print(f"Invalid path: {path}", file=sys.stderr)
+                    self.missing.add(path)
+                continue
+            self.missing.discard(path)
+            for pdf_path in candidates:
+                try:
+                    stat = os.stat(pdf_path)
+                except OSError:
+                    continue
+                files[pdf_path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def refresh(self, cache: Optional[ExtractionCache]) -> Tuple[int, int]:
+        """Load new and changed PDFs and drop removed ones; returns (loaded, removed)."""
+        files = self.list_files()
+        with self.lock:
+            removed = [pdf_path for pdf_path in self.documents if pdf_path not in files]
+            for pdf_path in removed:
+                del self.documents[pdf_path]
+            current = {pdf_path: (document.size, document.mtime_ns) for pdf_path, document in self.documents.items()}
+
+        loaded = 0
+        pending = []
+        for pdf_path, signature in files.items():
+            if current.get(pdf_path) == signature or self.failed.get(pdf_path) == signature:
+                continue
+            pages = cache.get(pdf_path) if cache is not None else None
+            if pages is None:
+                pending.append(pdf_path)
+            else:
+                self.add(pdf_path, signature, pages)
+                loaded += 1
+
+        extract = partial(extract_pages_worker, backend=self.args.backend)
+        if self.args.jobs > 1 and len(pending) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = ProcessPoolExecutor(max_workers=self.args.jobs)
+            try:
+                loaded += self.add_extracted(cache, files, zip(pending, executor.map(extract, pending)))
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            loaded += self.add_extracted(cache, files, ((pdf_path, extract(pdf_path)) for pdf_path in pending))
+        if cache is not None:
+            cache.flush()
+        return loaded, len(removed)
+
+    def add_extracted(self, cache: Optional[ExtractionCache], files: dict, extracted) -> int:
+        """Serve freshly extracted PDFs and cache their pages; returns how many were added."""
+        added = 0
+        for pdf_path, (pages, error) in extracted:
+            if self.stopping.is_set():
+                break
+            if error:
+                print(error, file=sys.stderr)
+                self.failed[pdf_path] = files[pdf_path]
+                continue
+            if cache is not None:
+                cache.put(pdf_path, pages)
+            self.add(pdf_path, files[pdf_path], pages)
+            added += 1
+        return added
+
+    def add(self, pdf_path: str, signature: Tuple[int, int], pages: List[str]) -> None:
+        document = Document(*signature, pages)
+        with self.lock:
+            self.documents[pdf_path] = document
+        self.failed.pop(pdf_path, None)
+
+    def watch(self) -> None:
+        """Refresh the corpus every --poll seconds until stopped; runs in its own thread."""
+        cache = open_cache(self.args)
+        try:
+            while not self.stopping.is_set():
+                started = time.monotonic()
+                try:
+                    loaded, removed = self.refresh(cache)
+                except Exception as e:
+                    print(f"Error refreshing served PDFs: {e}", file=sys.stderr)
+                else:
+                    if loaded or removed or not self.loaded.is_set():
+                        print(f"Loaded {loaded} new or changed PDFs, removed {removed}; serving "
+                              f"{len(self.documents)} PDFs ({time.monotonic() - started:.1f}s).", file=sys.stderr)
+                self.loaded.set()
+                self.stopping.wait(self.args.poll)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def search(self, matcher: TermMatcher, scopes: List[str], recursive: bool,
+               per_file_limit: Optional[int] = None) -> Iterator[Tuple[str, str, int, Tuple[str, ...]]]:
+        """
+        Yield (pdf_path, sentence, page_number, terms) for served PDFs in path
+        order, limited to those under scopes when any are given.
+        """
+        with self.lock:
+            documents = sorted(self.documents.items())
+        for pdf_path, document in documents:
+            if scopes and not any(in_scope(pdf_path, scope, recursive) for scope in scopes):
+                continue
+            for sentence, page_num, terms in islice(document.matches(matcher), per_file_limit):
+                yield pdf_path, sentence, page_num, terms
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """
+    Answer one query per connection: a JSON line in, then one JSON line per
+    match and a closing summary with "done" set (or a single "error") out.
+    """
+
+    def handle(self):
+        corpus = self.server.search_server
+        try:
+            query = json.loads(self.rfile.readline())
+            if not isinstance(query, dict):
+                raise ValueError("a query must be a JSON object")
+            terms = query.get("terms")
+            # An empty alternation would match every sentence
+            if not (isinstance(terms, list) and terms and all(isinstance(term, str) and term for term in terms)):
+                raise ValueError(f"terms must be a non-empty list of non-empty strings, not {terms!r}")
+            matcher = TermMatcher(terms, regex=query.get("regex", False))
+            for limit in ("per_file_limit", "max_matches"):
+                value = query.get(limit)
+                if value is not None and (not isinstance(value, int) or value < 0):
+                    raise ValueError(f"{limit} must be a non-negative integer, not {value!r}")
+            matches = corpus.search(matcher, query.get("paths") or [], query.get("recursive", False),
+                                    query.get("per_file_limit"))
+            max_matches = query.get("max_matches")
+        except (ValueError, KeyError, TypeError, re.error) as e:
+            self.reply([json.dumps({"error": f"Invalid query: {e}"})])
+            return
+
+        batch = []
+        size = 0
+        for pdf_path, sentence, page_num, terms in islice(matches, max_matches):
+            line = json.dumps({"file": pdf_path, "page": page_num, "sentence": sentence, "terms": list(terms)})
+            batch.append(line)
+            size += len(line)
+            if size >= REPLY_BUFFER_BYTES:
+                if not self.reply(batch):
+                    return
+                batch = []
+                size = 0
+        batch.append(json.dumps({"done": True, "documents": len(corpus.documents),
+                                 "loading": not corpus.loaded.is_set()}))
+        self.reply(batch)
+
+    def reply(self, lines: List[str]) -> bool:
+        """Send JSON lines to the client; returns False once it has gone away."""
+        try:
+            self.wfile.write("".join(line + "\n" for line in lines).encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        return True
+
+def serve_main(argv: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="pdf_text_search.py serve",
+        description="Keep the text of PDF files and folders in memory, reload PDFs as they change, "
+                    "and answer searches run with --connect over a Unix socket.")
+    parser.add_argument("paths", nargs='+', help="PDF files or folders to serve (space-separated)")
+    add_cache_arguments(parser)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH,
+                       help=f"Unix socket to listen on (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, metavar="SECONDS",
+                       help=f"Seconds between checks of the served paths for changes (default: {DEFAULT_POLL_SECONDS:g})")
+    args = parser.parse_args(argv)
+    select_backend(parser, args)
+    if not hasattr(socket, "AF_UNIX"):
+        parser.error("serve needs Unix domain sockets, which this platform does not support")
+
+    if os.path.exists(args.socket):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(args.socket)
+        except OSError:
+            os.unlink(args.socket)  # Left behind by a server that did not shut down cleanly
+        else:
+            parser.error(f"a server is already listening on {args.socket}")
+    os.makedirs(os.path.dirname(args.socket) or ".", exist_ok=True)
+
+    corpus = SearchServer(args.paths, args)
+    umask = os.umask(0o077)  # Only the owner may connect
+    try:
+        server = socketserver.ThreadingUnixStreamServer(args.socket, QueryHandler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    server.search_server = corpus
+    watcher = threading.Thread(target=corpus.watch, name="watcher", daemon=True)
+    watcher.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print(f"Serving {', '.join(args.paths)} on {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        corpus.stopping.set()
+        server.server_close()
+        os.unlink(args.socket)
+        watcher.join()
+
+def iter_server_matches(socket_path: str, query: dict) -> Iterator[Tuple[str, str, int, Tuple[str, ...]]]:
+    """Send a query to a serve process and yield its matches as (pdf_path, sentence, page_number, terms)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except OSError as e:
+            raise ConnectionError(f"Cannot connect to the search server at {socket_path}: {e}") from e
+        connection.sendall((json.dumps(query) + "\n").encode("utf-8"))
+        with connection.makefile("r", encoding="utf-8") as replies:
+            for line in replies:
+                reply = json.loads(line)
+                if "error" in reply:
+                    raise ValueError(reply["error"])
+                if reply.get("done"):
+                    if reply.get("loading"):
+                        print("The search server is still loading PDFs; results may be incomplete.",
+                              file=sys.stderr)
+                    return
+                yield reply["file"], reply["sentence"], reply["page"], tuple(reply["terms"])
+    raise ConnectionError("The search server closed the connection before answering.")
+
+def display_path(pdf_path: str, scopes: List[Tuple[str, str]]) -> str:
+    """
+    Show an absolute path from the server the way a local search would: relative
+    to the (given, absolute) file or folder it was found under.
+    """
+    for given, scope in scopes:
+        if pdf_path == scope:
+            return given
+        if pdf_path.startswith(os.path.join(scope, "")):
+            return os.path.join(given, os.path.relpath(pdf_path, scope))
+    return pdf_path
+
+def main():
+    if sys.argv[1:2] == ["index"]:
+        return index_main(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        return serve_main(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(
+        description="Search for text in PDF files and display sentences containing matches.",
+        epilog="Run 'pdf_text_search.py index PATH...' to build an index for --use-index, or "
+               "'pdf_text_search.py serve PATH...' to keep PDFs in memory for --connect. "
+               "To search for the word 'index' or 'serve' itself, put '--' before it.")
+    parser.add_argument("operands", nargs='+', metavar="PATH",
+                       help="Text to search for, unless given with -e or -f, "
+                            "followed by PDF files or folders to search (space-separated)")
+    parser.add_argument("-e", "--expression", action="append", dest="expressions", metavar="TERM",
+                       help="Search term; repeat to search for several terms in one pass")
+    parser.add_argument("-f", "--terms-file", metavar="FILE",
+                       help="Read search terms from FILE, one per line")
+    parser.add_argument("-E", "--regex", action="store_true",
+                       help="Treat search terms as regular expressions")
     parser.add_argument("-c", "--color", default="red", 
                        choices=['red', 'green', 'yellow', 'blue', 'no-color'],
                        help="Color for highlighting matches (default: red)")
     parser.add_argument("-s", "--style", default="color", 
                        choices=['color', 'bold', 'underline'],
                        help="Style for highlighting matches (default: color)")
+    parser.add_argument("--ordered", action="store_true",
+                       help="With --jobs, report files in input order instead of completion order")
+    parser.add_argument("--max-matches", type=int, metavar="N",
+                       help="Stop after N matches in total")
+    parser.add_argument("--first-match-per-file", action="store_true",
+                       help="Report only the first match in each file and stop reading it")
+    parser.add_argument("--json", action="store_true",
+                       help="Print one JSON object per match (JSON Lines) instead of highlighted text")
+    parser.add_argument("--use-index", action="store_true",
+                       help="Answer from the inverted index for indexed, unchanged PDFs and scan only the rest")
+    parser.add_argument("--connect", action="store_true",
+                       help="Search the PDFs held by a running 'pdf_text_search.py serve'; "
+                            "paths are optional and narrow the search")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH,
+                       help=f"Unix socket of the server for --connect (default: {DEFAULT_SOCKET_PATH})")
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
-    search_term = args.search_term.strip()
-    paths = args.paths
-    recursive = args.recursive
+    select_backend(parser, args)
     color = args.color
     style = args.style
+
+    terms = [term.strip() for term in args.expressions or []]
+    if args.terms_file:
+        with open(args.terms_file, 'r', encoding='utf-8') as terms_file:
+            terms.extend(line.strip() for line in terms_file if line.strip())
+    paths = args.operands
+    if not args.expressions and not args.terms_file:
+        terms, paths = [paths[0].strip()], paths[1:]
+    if not paths and not args.connect:
+        parser.error("at least one PDF file or folder is required")
+    if args.max_matches is not None and args.max_matches < 0:
+        parser.error("--max-matches must be at least 0")
     
-    if not search_term:
+    if not terms or not all(terms):
         print("Search term cannot be empty.")
         return
+    try:
+        matcher = TermMatcher(terms, regex=args.regex)
+    except re.error as e:
+        print(f"Invalid regular expression: {e}")
+        return
     
-    pdf_files = []
-    for path in paths:
-        if os.path.isdir(path):
-            pdf_files.extend(get_pdf_files_from_folder(path, recursive))
-        elif os.path.isfile(path):
-            pdf_files.append(path)
-        else:
-            print(f"Invalid path: {path}")
-    
+    per_file_limit = 1 if args.first_match_per_file else args.max_matches
+    term_hits = dict.fromkeys(terms, 0)
+    if args.connect:
+        scopes = [(path, os.path.abspath(path)) for path in paths]
+        query = {"terms": terms, "regex": args.regex, "paths": [scope for _, scope in scopes],
+                 "recursive": args.recursive, "per_file_limit": per_file_limit, "max_matches": args.max_matches}
+        matches = iter_server_matches(args.socket, query)
+        try:
+            found = print_matches(((display_path(pdf_path, scopes), *match) for pdf_path, *match in matches),
+                                  matcher, color, style, args.json, term_hits)
+        except (ConnectionError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return
+        print_summary(terms, found, term_hits, args.json)
+        return
+
+    pdf_files = collect_pdf_files(paths, args.recursive)
     if not pdf_files:
         print("No valid PDF files found.")
         return
     
-    pdf_files = list(dict.fromkeys(pdf_files))  # Remove duplicates
-    
-    results = search_pdfs(pdf_files, search_term)
-    
-    if not results:
-        print(f"No matches found for '{search_term}'.")
-        return
-        
-    print(f"\nResults for '{search_term}':")
-    for pdf_path, matches in results.items():
-        print(f"\nIn {pdf_path}:")
-        for i, (sentence, page_num) in enumerate(matches, 1):
-            highlighted_sentence = highlight_text(sentence, search_term, color, style)
-            print(f"Match {i} (approx. page {page_num}): {highlighted_sentence}")
+    streams = []
+    if args.use_index:
+        if os.path.exists(args.index_path):
+            index = SearchIndex(args.index_path)
+            try:
+                indexed = [pdf_path for pdf_path in pdf_files if index.is_current(pdf_path)]
+                indexed_results = index.search(matcher, indexed)
+            finally:
+                index.close()
+            streams.append(
+                (pdf_path, *match)
+                for pdf_path, matches in indexed_results.items()
+                for match in matches[:per_file_limit]
+            )
+            indexed = set(indexed)
+            pdf_files = [pdf_path for pdf_path in pdf_files if pdf_path not in indexed]
+        else:
+            print(f"No index at {args.index_path}; searching without it.", file=sys.stderr)
+
+    cache = open_cache(args)
+    streams.append(iter_matches(pdf_files, matcher, cache, jobs=args.jobs, ordered=args.ordered,
+                                per_file_limit=per_file_limit, backend=args.backend))
+    try:
+        found = print_matches(islice(chain(*streams), args.max_matches), matcher, color, style, args.json, term_hits)
+    finally:
+        streams[-1].close()
+        if cache is not None:
+            cache.close()
+    print_summary(terms, found, term_hits, args.json)
+
+def print_summary(terms: List[str], found: int, term_hits: dict, json_lines: bool = False) -> None:
+    """Report a search without matches, or the hits per term of a search for several terms."""
+    quoted_terms = ", ".join(f"'{term}'" for term in terms)
+    if not found and not json_lines:
+        print(f"No matches found for {quoted_terms}.")
+    if found and len(terms) > 1:
+        output = sys.stderr if json_lines else sys.stdout
+        print("\nHits per term:", file=output)
+        for term, hits in term_hits.items():
+            print(f"  {term}: {hits}", file=output)
+
+def print_matches(matches: Iterable[Tuple[str, str, int, Tuple[str, ...]]], matcher: TermMatcher,
+                  color: str, style: str, json_lines: bool = False, term_hits: Optional[dict] = None) -> int:
+    """
+    Print matches as they arrive, grouped by file, and return how many were printed.
+    term_hits, when given, is updated with the number of matching sentences per term.
+    """
+    if not json_lines:
+        colorama.init(autoreset=True)
+    highlight = Highlighter(matcher.pattern, color, style)
+    quoted_terms = ", ".join(f"'{term}'" for term in matcher.terms)
+    found = 0
+    current_pdf = None
+    for pdf_path, sentence, page_num, terms in matches:
+        found += 1
+        if term_hits is not None:
+            for term in terms:
+                term_hits[term] += 1
+        if json_lines:
+            print(json.dumps({"file": pdf_path, "page": page_num, "sentence": sentence, "terms": list(terms)}),
+                  flush=True)
+            continue
+
+        if found == 1:
+            print(f"\nResults for {quoted_terms}:")
+        if pdf_path != current_pdf:
+            current_pdf = pdf_path
+            file_matches = 0
+            print(f"\nIn {pdf_path}:")
+        file_matches += 1
+        print(f"Match {file_matches} (page {page_num}): {highlight(sentence)}", flush=True)
+    return found
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import random
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_diff() -> dict[str, object]:
+    return runpy.run_path(str(ROOT / "diff.py"))
+
+
+def run_diff(*args: str, check: bool = True) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, str(ROOT / "diff.py"), *args], capture_output=True, text=True, check=check)
+
+
+def test_parse_mode_normalizes_requirements_and_follows_includes(tmp_path: Path) -> None:
+    (tmp_path / "base.txt").write_text(
+        "Django[Argon2,bcrypt] >= 4.2, <5  # web\n"
+        "Zope.Interface==6.0\n"
+        "requests==2.31 ; python_version>='3.8'\n"
+        "-r common/extra.txt\n"
+        "-c constraints.txt\n"
+    )
+    (tmp_path / "common").mkdir()
+    (tmp_path / "common" / "extra.txt").write_text("numpy==1.26\nold-package==1.0\n")
+    (tmp_path / "new.txt").write_text(
+        "django[bcrypt,argon2]<5,>=4.2\n"
+        "zope_interface == 6.0\n"
+        'requests == 2.31; python_version >= "3.8"\n'
+        "numpy==1.26.4 \\\n"
+        "    ; sys_platform == 'linux'\n"
+        "numpy==1.26\n"
+        "-e git+https://example.test/tool.git#egg=Tool\n"
+    )
+
+    result = run_diff("--parse", "--symmetric", str(tmp_path / "base.txt"), str(tmp_path / "new.txt"))
+    assert result.stdout.splitlines() == [
+        '+ numpy==1.26.4; sys_platform == "linux"',
+        "+ -e git+https://example.test/tool.git#egg=Tool",
+        "- old-package==1.0",
+    ]
+
+
+def test_markers_compare_equal_regardless_of_spacing_and_quotes() -> None:
+    diff = load_diff()
+    normalize_marker = diff["normalize_marker"]
+    assert normalize_marker("python_version>='3.8'") == 'python_version >= "3.8"'
+    assert normalize_marker(' ( os_name=="nt"or sys_platform  !=  "darwin" )and extra==\'x\'') == (
+        '(os_name == "nt" or sys_platform != "darwin") and extra == "x"'
+    )
+    assert normalize_marker("platform_release == \"it's\"") == "platform_release == \"it's\""
+    assert diff["parse_requirement"]("pkg ; python_version<'3.10'") == diff["parse_requirement"](
+        'pkg;python_version < "3.10"'
+    )
+
+
+def test_include_cycles_are_skipped_without_truncating_later_parses(tmp_path: Path) -> None:
+    diff = load_diff()
+    (tmp_path / "a.txt").write_text("alpha==1\n-r b.txt\n")
+    (tmp_path / "b.txt").write_text("beta==1\n-r a.txt\n")
+    (tmp_path / "c.txt").write_text("gamma==1\n-r b.txt\n")
+
+    cache = {}
+    names = [
+        sorted(name for name, _ in diff["parse_requirements_file"](str(tmp_path / path), cache)[0])
+        for path in ("a.txt", "b.txt", "c.txt")
+    ]
+    assert names == [["alpha", "beta"], ["alpha", "beta"], ["alpha", "beta", "gamma"]]
+
+    result = run_diff("--parse", str(tmp_path / "a.txt"), str(tmp_path / "b.txt"))
+    assert result.stdout == ""
+    assert result.stderr.count("includes itself, skipping.") == 2
+
+
+def test_hashes_and_other_requirement_options_are_ignored(tmp_path: Path) -> None:
+    (tmp_path / "old.txt").write_text(
+        "django==4.2 --hash=sha256:aaa \\\n"
+        "    --hash=sha256:bbb\n"
+        'numpy>=1.0; python_version < "3.8" --hash=sha256:x\n'
+    )
+    (tmp_path / "new.txt").write_text(
+        "django==4.2 --hash=sha256:ccc\n"
+        "numpy>=1.0 ; python_version<'3.8' --hash sha256:y --config-settings=opt=1\n"
+        "pillow==10.0 --hash=sha256:ddd\n"
+    )
+
+    result = run_diff("--parse", "--symmetric", str(tmp_path / "old.txt"), str(tmp_path / "new.txt"))
+    assert result.stdout.splitlines() == ["+ pillow==10.0"]
+
+
+def test_unreadable_include_is_reported_with_its_line(tmp_path: Path) -> None:
+    (tmp_path / "base.txt").write_text("# pinned\nrequests==2.31\n-r missing.txt\n")
+
+    result = run_diff("--parse", str(tmp_path / "base.txt"), str(tmp_path / "base.txt"), check=False)
+    assert result.returncode == 1
+    assert result.stderr == (
+        f"Error: {tmp_path / 'base.txt'}:3: cannot read {tmp_path / 'missing.txt'}: No such file or directory\n"
+    )
+
+
+def test_streaming_modes_match_the_in_memory_diff(tmp_path: Path) -> None:
+    rng = random.Random(7)
+    packages = [f"package-{number}=={rng.randint(0, 9)}" for number in range(400)]
+    lines1 = rng.sample(packages, 250) + ["# comment", "", packages[0]]
+    lines2 = rng.sample(packages, 250)
+    for name, lines in (("one.txt", lines1), ("two.txt", lines2)):
+        (tmp_path / name).write_text("\n".join(lines) + "\n")
+        (tmp_path / f"sorted-{name}").write_text("\n".join(sorted(lines)) + "\n")
+
+    for mode in ([], ["--symmetric"]):
+        expected = run_diff(*mode, str(tmp_path / "one.txt"), str(tmp_path / "two.txt")).stdout
+        assert expected
+        assert run_diff(*mode, "--stream", str(tmp_path / "one.txt"), str(tmp_path / "two.txt")).stdout == expected
+        assert run_diff(*mode, "--sorted", str(tmp_path / "sorted-one.txt"),
+                        str(tmp_path / "sorted-two.txt")).stdout == expected
+
+    unsorted = run_diff("--sorted", str(tmp_path / "one.txt"), str(tmp_path / "two.txt"), check=False)
+    assert unsorted.returncode == 1
+    assert "is not sorted" in unsorted.stderr
+
+
+def test_external_sort_spills_and_merges_chunks(tmp_path: Path) -> None:
+    diff = load_diff()
+    rng = random.Random(3)
+    entries = [f"line-{rng.randint(0, 10 ** 6)}" for _ in range(2000)]
+
+    spilled = list(diff["external_sort"](iter(entries), 4096, temp_dir=str(tmp_path)))
+    assert spilled == sorted(entries)
+    assert list(tmp_path.iterdir()) == []
+    merged = diff["merge_diff"](diff["iter_unique_sorted"](spilled, "a"), iter(["line-a", "line-b"]), True)
+    assert list(merged) == sorted(set(entries) | {"line-a", "line-b"})
+
+
+def test_external_sort_merges_many_spill_files_in_bounded_passes(tmp_path: Path) -> None:
+    diff = load_diff()
+    external_sort = diff["external_sort"]
+    external_sort.__globals__["MERGE_FAN_IN"] = 4
+    iter_spilled_lines = diff["iter_spilled_lines"]
+    open_files = []
+    most_open = 0
+
+    def counting_spilled_lines(path):
+        nonlocal most_open
+        open_files.append(path)
+        most_open = max(most_open, len(open_files))
+        try:
+            yield from iter_spilled_lines(path)
+        finally:
+            open_files.remove(path)
+
+    external_sort.__globals__["iter_spilled_lines"] = counting_spilled_lines
+    rng = random.Random(5)
+    entries = [f"entry-{rng.randint(0, 10 ** 6)}" for _ in range(3000)]
+
+    assert list(external_sort(iter(entries), 2048, temp_dir=str(tmp_path))) == sorted(entries)
+    assert most_open == 4
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import io
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_dirtree() -> dict[str, object]:
+    return runpy.run_path(str(ROOT / "dirtree.py"))
+
+
+def make_tree(root: Path, files: dict[str, int]) -> None:
+    """Create files of the given sizes (in bytes) below root."""
+    for rel_path, size in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+
+
+def test_tree_is_sorted_and_honours_excludes_and_depth(tmp_path: Path) -> None:
+    dirtree = load_dirtree()
+    make_tree(tmp_path, {"b.txt": 1, "a/one.py": 1, "a/deep/two.py": 1, "build/out.o": 1, ".hidden": 1})
+
+    out = io.StringIO()
+    dirtree["print_tree"](str(tmp_path), show_hidden=False, exclude=["build", "a/deep/*.py"], out=out)
+    assert out.getvalue().splitlines() == [
+        "├── a",
+        "│   ├── deep",
+        "│   └── one.py",
+        "└── b.txt",
+    ]
+
+    out = io.StringIO()
+    dirtree["print_tree"](str(tmp_path), max_depth=1, out=out)
+    assert out.getvalue().splitlines() == ["├── .hidden", "├── a", "├── b.txt", "└── build"]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_symlink_back_to_an_ancestor_is_not_followed(tmp_path: Path) -> None:
+    dirtree = load_dirtree()
+    make_tree(tmp_path, {"a/file": 1, "other/file": 1})
+    (tmp_path / "a" / "loop").symlink_to(tmp_path)
+    (tmp_path / "a" / "sibling").symlink_to(tmp_path / "other")
+
+    assert list(dirtree["iter_tree"](str(tmp_path))) == [
+        "├── a",
+        "│   ├── file",
+        "│   ├── loop  [recursive, not followed]",
+        "│   └── sibling",
+        "│       └── file",
+        "└── other",
+        "    └── file",
+    ]
+
+
+def test_sizes_are_cumulative_largest_first_and_trimmed(tmp_path: Path) -> None:
+    dirtree = load_dirtree()
+    make_tree(tmp_path, {"small/a": 10, "big/a": 3000, "big/b": 1000, "big/c": 5, "top.bin": 2048})
+
+    out = io.StringIO()
+    dirtree["print_usage_tree"](str(tmp_path), top=2, min_size=100, jobs=3, out=out)
+    assert out.getvalue().splitlines()[1:] == [
+        "├── big (3.9K, 3 files)",
+        "│   ├── a (2.9K)",
+        "│   ├── b (1000B)",
+        "│   └── … 1 more entry (5B)",
+        "├── top.bin (2.0K)",
+        "└── … 1 more entry (10B)",
+    ]
+    assert out.getvalue().splitlines()[0] == f"{tmp_path} (5.9K, 5 files)"
+    assert dirtree["parse_size"]("1.5GiB") == 3 * 1024 ** 3 // 2
+    assert dirtree["format_size"](512) == "512B"
+
+
+def test_snapshot_rescans_changed_directories_and_diffs(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    dirtree = load_dirtree()
+    tree = tmp_path / "tree"
+    make_tree(tree, {"keep/a": 100, "grow/a": 100, "gone/a": 100})
+    first, second = str(tmp_path / "first.json.gz"), str(tmp_path / "second.json.gz")
+
+    dirtree["print_usage_tree"](str(tree), snapshot_path=first, out=io.StringIO())
+    capsys.readouterr()
+    shutil.copyfile(first, second)
+
+    (tree / "grow" / "b").write_bytes(b"x" * 400)
+    os.utime(tree / "grow", ns=(1, 1))
+    (tree / "gone" / "a").unlink()
+    (tree / "gone").rmdir()
+    os.utime(tree, ns=(2, 2))
+    out = io.StringIO()
+    dirtree["print_usage_tree"](str(tree), snapshot_path=second, out=out)
+    assert "rescanned 2 of 3 directories" in capsys.readouterr().err
+
+    fresh = io.StringIO()
+    dirtree["print_usage_tree"](str(tree), out=fresh)
+    assert out.getvalue() == fresh.getvalue()
+
+    diff = io.StringIO()
+    assert dirtree["print_snapshot_diff"](first, second, out=diff)
+    assert diff.getvalue().splitlines() == [
+        "- gone (100B)",
+        "~ grow (100B -> 500B, +400B)",
+        "+ grow/b (400B)",
+        "1 added, 1 removed, 1 changed in size",
+    ]
+    assert not dirtree["print_snapshot_diff"](first, str(tmp_path / "missing.json.gz"))
+
+
+def test_unreadable_root_exits_with_status_2(tmp_path: Path) -> None:
+    result = subprocess.run([sys.executable, str(ROOT / "dirtree.py"), str(tmp_path / "missing")],
+                            capture_output=True, text=True)
+    assert result.returncode == 2
+    assert result.stdout == ""
+    assert f"dirtree: cannot read {tmp_path / 'missing'}" in result.stderr
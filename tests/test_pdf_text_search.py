@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import itertools
+import json
+import runpy
+import socketserver
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("colorama")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def load_pdf_text_search() -> dict[str, object]:
+    return runpy.run_path(str(ROOT / "pdf_text_search.py"))
+
+
+def test_pages_without_sentence_boundaries_are_flushed_in_bounded_stretches() -> None:
+    pts = load_pdf_text_search()
+    limit = pts["MAX_SENTENCE_CHARS"]
+    page = "cell 12 | cell 34 | cell 56 " * 40
+    pages = [page] * 3000
+    pages[1234] = page + " needle "
+
+    stretches = list(pts["iter_sentence_stretches"](pages))
+    assert max(len(text) for text, *_ in stretches) <= limit + len(page) + 10
+    assert sum(len(text) for text, *_ in stretches) == sum(len(page_text) + 1 for page_text in pages)
+
+    matches = list(pts["iter_sentence_matches"](pages, pts["TermMatcher"](["needle"])))
+    assert [(page_num, terms) for _, page_num, terms in matches] == [(1235, ("needle",))]
+
+    # A sentence that does end still spans the page break it continues over
+    matches = list(pts["iter_sentence_matches"](["First one. Second", "continues here. Third."],
+                                                 pts["TermMatcher"](["continues"])))
+    assert matches == [("Second continues here.", 2, ("continues",))]
+
+
+def test_index_answers_page_spanning_sentences_like_a_scan(tmp_path: Path) -> None:
+    pts = load_pdf_text_search()
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(b"%PDF stand-in")
+    pages = [
+        "Kernel notes. Another line about kernel\n",
+        "cache continues here. The cache is warm.",
+        "",
+        "Empty page above. Kernel cache",
+        "again, on two pages!",
+    ]
+    index = pts["SearchIndex"](str(tmp_path / "index.sqlite3"))
+    try:
+        index.add_document(str(pdf_path), pages)
+        for terms, regex in ((["continues"], False), (["cache", "kernel"], False), (["again|notes"], True)):
+            matcher = pts["TermMatcher"](terms, regex=regex)
+            scanned = list(pts["iter_sentence_matches"](pages, matcher))
+            assert index.search(matcher, [str(pdf_path)]).get(str(pdf_path), []) == scanned
+    finally:
+        index.close()
+
+    matcher = pts["TermMatcher"](["continues"])
+    assert list(pts["iter_sentence_matches"](pages, matcher)) == [
+        ("Another line about kernel\n cache continues here.", 2, ("continues",))
+    ]
+
+
+def write_pdf(path: Path, pages: list[str]) -> None:
+    """Write a minimal PDF with one Helvetica text line per line of each page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))}] "
+        f"/Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        lines = " ".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*"
+            for line in text.split("\n")
+        )
+        stream = f"BT /F1 10 Tf 20 750 Td 12 TL {lines} ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode())
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(data))
+
+
+def run_pdf_text_search(tmp_path: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(ROOT / "pdf_text_search.py"), *args,
+         "--cache-path", str(tmp_path / "cache.sqlite3"), "--index-path", str(tmp_path / "index.sqlite3")],
+        capture_output=True, text=True, check=True,
+    )
+
+
+def add_fake_backend(pts: dict[str, object], monkeypatch: pytest.MonkeyPatch,
+                     documents: dict[str, list[str]]) -> list[tuple[str, int]]:
+    """Register a 'fake' backend serving documents by path; returns the (path, page index) reads."""
+    reads = []
+
+    class FakeBackend(pts["PdfBackend"]):
+        name = "fake"
+
+        def iter_pages(self, pdf_path: str):
+            for page_index, page in enumerate(documents[pdf_path]):
+                reads.append((pdf_path, page_index))
+                yield page
+
+    monkeypatch.setitem(pts["BACKENDS"], "fake", FakeBackend())
+    return reads
+
+
+def test_extraction_cache_hits_invalidates_and_evicts_least_recently_used(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pts = load_pdf_text_search()
+    clock = itertools.count(1)
+    monkeypatch.setitem(pts["ExtractionCache"].get.__globals__, "time", SimpleNamespace(time=lambda: next(clock)))
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.pdf"
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+
+    cache = pts["ExtractionCache"](str(tmp_path / "cache.sqlite3"), 1 << 20)
+    for path in paths:
+        cache.put(path, [f"text of {path}"])
+    assert cache.get(paths[0]) == [f"text of {paths[0]}"]
+    assert pts["ExtractionCache"](str(tmp_path / "cache.sqlite3"), 1 << 20, backend="pdfium").get(paths[0]) is None
+
+    # b is now the least recently used entry, so it goes first
+    total = cache.connection.execute("SELECT SUM(bytes) FROM extractions").fetchone()[0]
+    cache.max_bytes = total - 1
+    cache.flush()
+    assert [cache.get(path) is not None for path in paths] == [True, False, True]
+
+    Path(paths[2]).write_bytes(b"changed")
+    assert cache.get(paths[2]) is None
+    cache.close()
+
+    rebuilt = pts["ExtractionCache"](str(tmp_path / "cache.sqlite3"), 1 << 20, rebuild=True)
+    assert rebuilt.get(paths[0]) is None
+    rebuilt.close()
+
+
+def test_first_match_per_file_stops_reading_and_caches_nothing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pts = load_pdf_text_search()
+    pdf_path = tmp_path / "long.pdf"
+    pdf_path.write_bytes(b"%PDF stand-in")
+    reads = add_fake_backend(pts, monkeypatch, {str(pdf_path): [
+        "Intro. The kernel starts here.", "More kernel text.", "Even more kernel.", "Last kernel page.",
+    ]})
+    cache = pts["ExtractionCache"](str(tmp_path / "cache.sqlite3"), 1 << 20, backend="fake")
+
+    matches = list(pts["iter_matches"]([str(pdf_path)], pts["TermMatcher"](["kernel"]), cache,
+                                       per_file_limit=1, backend="fake"))
+    assert [(sentence, page_num) for _, sentence, page_num, _ in matches] == [("The kernel starts here.", 1)]
+    # The sentence could continue on page 2, so that page is read, but no further
+    assert reads == [(str(pdf_path), 0), (str(pdf_path), 1)]
+    assert cache.get(str(pdf_path)) is None
+
+    list(pts["iter_matches"]([str(pdf_path)], pts["TermMatcher"](["kernel"]), cache, backend="fake"))
+    assert cache.get(str(pdf_path)) is not None
+    cache.close()
+
+
+def test_matches_report_the_page_of_the_first_hit() -> None:
+    pts = load_pdf_text_search()
+    pages = ["Intro text. The long sentence", "ends with kernel here. Next."]
+    assert list(pts["iter_sentence_matches"](pages, pts["TermMatcher"](["kernel"]))) == [
+        ("The long sentence ends with kernel here.", 2, ("kernel",))
+    ]
+    assert list(pts["iter_sentence_matches"](pages, pts["TermMatcher"](["long"]))) == [
+        ("The long sentence ends with kernel here.", 1, ("long",))
+    ]
+    # Empty pages still count towards the page number
+    assert list(pts["iter_sentence_matches"](["", "", "Kernel on three."], pts["TermMatcher"](["kernel"]))) == [
+        ("Kernel on three.", 3, ("kernel",))
+    ]
+
+
+def test_several_terms_are_matched_in_one_pass_and_attributed(capsys: pytest.CaptureFixture[str]) -> None:
+    pts = load_pdf_text_search()
+    matcher = pts["TermMatcher"](["kernel", "Cache", "c++"])
+    pages = ["The kernel cache is warm. Nothing here. C++ and the KERNEL.", "Only a cache."]
+
+    matches = list(pts["iter_sentence_matches"](pages, matcher))
+    assert matches == [
+        ("The kernel cache is warm.", 1, ("kernel", "Cache")),
+        ("C++ and the KERNEL.", 1, ("kernel", "c++")),
+        ("Only a cache.", 2, ("Cache",)),
+    ]
+    assert pts["TermMatcher"](["ker.el", "^only"], regex=True).terms_in("Only a kernel") == ("ker.el", "^only")
+
+    term_hits = dict.fromkeys(matcher.terms, 0)
+    found = pts["print_matches"]((("a.pdf", *match) for match in matches), matcher, "no-color", "color",
+                                 json_lines=True, term_hits=term_hits)
+    pts["print_summary"](matcher.terms, found, term_hits, json_lines=True)
+    output = capsys.readouterr()
+    assert [json.loads(line)["terms"] for line in output.out.splitlines()] == [
+        ["kernel", "Cache"], ["kernel", "c++"], ["Cache"],
+    ]
+    assert "kernel: 2" in output.err and "Cache: 2" in output.err and "c++: 1" in output.err
+
+
+def test_auto_backend_picks_the_fastest_installed_engine(monkeypatch: pytest.MonkeyPatch) -> None:
+    pts = load_pdf_text_search()
+    backends = pts["BACKENDS"]
+    for name, available in (("pdfium", False), ("pdftotext", True), ("pypdf2", True)):
+        monkeypatch.setattr(backends[name], "available", lambda available=available: available)
+
+    assert pts["resolve_backend"]("auto") == "pdftotext"
+    assert pts["resolve_backend"]("pypdf2") == "pypdf2"
+    with pytest.raises(ValueError, match="pip install pypdfium2"):
+        pts["resolve_backend"]("pdfium")
+
+    monkeypatch.setattr(backends["pdftotext"], "available", lambda: False)
+    assert pts["resolve_backend"]("auto") == "pypdf2"
+
+
+def test_connect_round_trip_matches_a_local_search(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pts = load_pdf_text_search()
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    documents = {
+        str(folder / "a.pdf"): ["Kernel notes. The kernel", "cache spans pages. Done."],
+        str(folder / "b.pdf"): ["No match here.", "A kernel again."],
+    }
+    for pdf_path in documents:
+        Path(pdf_path).write_bytes(b"%PDF stand-in")
+    add_fake_backend(pts, monkeypatch, documents)
+    args = argparse.Namespace(recursive=False, jobs=1, backend="fake", no_cache=True, poll=60.0)
+
+    corpus = pts["SearchServer"]([str(folder)], args)
+    assert corpus.refresh(None) == (2, 0)
+    corpus.loaded.set()
+    socket_path = str(tmp_path / "s.sock")
+    server = socketserver.ThreadingUnixStreamServer(socket_path, pts["QueryHandler"])
+    server.search_server = corpus
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        matcher = pts["TermMatcher"](["kernel"])
+        local = list(pts["iter_matches"](sorted(documents), matcher, backend="fake"))
+        query = {"terms": ["kernel"], "paths": [str(folder)]}
+        assert list(pts["iter_server_matches"](socket_path, query)) == local
+        assert len(list(pts["iter_server_matches"](socket_path, {**query, "max_matches": 2}))) == 2
+        assert list(pts["iter_server_matches"](socket_path, {**query, "paths": [str(tmp_path / "other")]})) == []
+        with pytest.raises(ValueError, match="max_matches must be a non-negative integer"):
+            list(pts["iter_server_matches"](socket_path, {**query, "max_matches": -1}))
+        for terms in (None, [], [""], "kernel", [1]):
+            with pytest.raises(ValueError, match="terms must be a non-empty list of non-empty strings"):
+                list(pts["iter_server_matches"](socket_path, {**query, "terms": terms}))
+        with pytest.raises(ValueError, match="a query must be a JSON object"):
+            list(pts["iter_server_matches"](socket_path, ["kernel"]))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    (folder / "b.pdf").unlink()
+    assert corpus.refresh(None) == (0, 1)
+
+
+def test_ordered_jobs_report_files_like_a_sequential_search(tmp_path: Path) -> None:
+    pytest.importorskip("PyPDF2")
+    pdf_paths = []
+    for number in range(6):
+        pdf_path = tmp_path / f"doc{number}.pdf"
+        write_pdf(pdf_path, [f"Document {number} mentions the kernel.", f"Page two of {number}. Kernel again."])
+        pdf_paths.append(str(pdf_path))
+
+    sequential = run_pdf_text_search(tmp_path, "--json", "--no-cache", "kernel", *pdf_paths).stdout
+    parallel = run_pdf_text_search(tmp_path, "--json", "--no-cache", "-j", "3", "--ordered", "kernel",
+                                   *pdf_paths).stdout
+    assert parallel == sequential
+    assert [json.loads(line)["page"] for line in sequential.splitlines()] == [1, 2] * 6
+
+    unordered = run_pdf_text_search(tmp_path, "--json", "-j", "3", "kernel", *pdf_paths).stdout
+    assert sorted(unordered.splitlines()) == sorted(sequential.splitlines())
+    # The parallel run cached every PDF, so a cached run still finds the same matches
+    assert run_pdf_text_search(tmp_path, "--json", "kernel", *pdf_paths).stdout == sequential
+
+
+def test_index_updates_incrementally_and_answers_like_a_scan(tmp_path: Path) -> None:
+    pytest.importorskip("PyPDF2")
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    write_pdf(folder / "a.pdf", ["Kernel notes. The kernel", "cache spans pages. Done."])
+    write_pdf(folder / "b.pdf", ["Nothing to see.", "A cache line."])
+    write_pdf(folder / "c.pdf", ["Kernel only."])
+
+    first = run_pdf_text_search(tmp_path, "index", str(folder))
+    assert first.stdout.strip() == "Indexed 3 new or changed PDFs, 0 unchanged, 0 removed."
+
+    write_pdf(folder / "b.pdf", ["Nothing to see.", "A kernel cache line, changed."])
+    (folder / "c.pdf").unlink()
+    second = run_pdf_text_search(tmp_path, "index", str(folder))
+    assert second.stdout.strip() == "Indexed 1 new or changed PDFs, 1 unchanged, 1 removed."
+
+    for terms in (["kernel"], ["-e", "cache", "-e", "kernel"], ["-E", "spans|changed"]):
+        scanned = run_pdf_text_search(tmp_path, "--json", "--no-cache", *terms, str(folder)).stdout
+        indexed = run_pdf_text_search(tmp_path, "--json", "--use-index", *terms, str(folder)).stdout
+        assert sorted(indexed.splitlines()) == sorted(scanned.splitlines())
+        assert scanned
+
+
+def test_jobs_keep_a_bounded_window_of_files_in_flight(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pts = load_pdf_text_search()
+    documents = {}
+    for number in range(20):
+        pdf_path = tmp_path / f"doc{number:02}.pdf"
+        pdf_path.write_bytes(b"%PDF stand-in")
+        documents[str(pdf_path)] = [f"Document {number} has a kernel.", "Nothing else."]
+    add_fake_backend(pts, monkeypatch, documents)
+    submitted = []
+
+    class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            future = super().submit(fn, *args, **kwargs)
+            submitted.append(future)
+            assert sum(not future.done() for future in submitted) <= 2 * 3
+            return future
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", CountingExecutor)
+    matcher = pts["TermMatcher"](["kernel"])
+    paths = sorted(documents)
+    sequential = list(pts["iter_matches"](paths, matcher, backend="fake"))
+
+    ordered = pts["iter_matches"](paths, matcher, jobs=3, ordered=True, backend="fake")
+    assert next(ordered) == sequential[0]
+    # The first result arrives before most files have even been submitted
+    assert len(submitted) <= 2 * 3
+    assert [next(ordered), *ordered] == sequential[1:]
+    assert len(submitted) == len(paths)
+
+    unordered = list(pts["iter_matches"](paths, matcher, jobs=3, backend="fake"))
+    assert sorted(unordered) == sequential
+
+
+def test_index_searches_and_prunes_only_the_requested_documents(tmp_path: Path) -> None:
+    pts = load_pdf_text_search()
+    (tmp_path / "sub").mkdir()
+    top, nested = tmp_path / "top.pdf", tmp_path / "sub" / "nested.pdf"
+    for pdf_path in (top, nested):
+        pdf_path.write_bytes(b"%PDF stand-in")
+    index = pts["SearchIndex"](str(tmp_path / "index.sqlite3"))
+    try:
+        index.add_document(str(top), ["The subkernel caches. Kernel cache lines."])
+        index.add_document(str(nested), ["A kernel cache here too."])
+
+        for terms, regex in ((["kernel cache"], False), (["el cac"], False), (["kern"], False), (["c.che"], True)):
+            matcher = pts["TermMatcher"](terms, regex=regex)
+            assert index.search(matcher, [str(top)]) == {
+                str(top): list(pts["iter_sentence_matches"](["The subkernel caches. Kernel cache lines."], matcher))
+            }
+        assert index.search(pts["TermMatcher"](["kernel"]), [str(tmp_path / "unindexed.pdf")]) == {}
+
+        # A non-recursive run does not see the subfolder, so it must not drop what is indexed there
+        assert index.remove_missing(str(tmp_path), [], recursive=False) == 1
+        assert index.remove_missing(str(tmp_path), [str(nested)], recursive=True) == 0
+        assert index.is_current(str(nested)) and not index.is_current(str(top))
+    finally:
+        index.close()